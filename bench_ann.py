@@ -0,0 +1,137 @@
+import argparse
+import random
+import time
+
+import lancedb
+import numpy as np
+
+import video_index
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+MODEL_NAME = "intfloat/multilingual-e5-large"  # Keep in sync with main.py
+QUERY_PREFIX = "query: " if "e5" in MODEL_NAME else ""
+VECTOR_METRIC = "cosine"  # What the IVF-PQ index was built with
+NUM_QUERIES = 200
+K = 60  # main.py fetches 3 x top_k candidates; top_k defaults to 20
+NPROBES = [1, 5, 10, 20, 40, 80, 160]
+REFINE_FACTORS = [0, 5, 10]  # 0 = no refine step
+TARGET_RECALL = 0.95  # Suggest the fastest setting at or above this
+WARMUP_QUERIES = 5
+SEED = 42
+# Fetched like main.py's result columns, so latencies include reading them
+SKIP_COLUMNS = {"vector", video_index.ACTRESS_LIST_COLUMN, video_index.DVDID_KEY_COLUMN, video_index.FTS_TEXT_COLUMN}
+
+
+def sample_queries(table, n, source, backend):
+    """
+    Query vectors for n random videos: their stored vectors, or their titles
+    embedded the way main.py embeds a typed query.
+    """
+    ids = table.search().select(["dvdid"]).limit(None).to_arrow()["dvdid"].to_pylist()
+    sample = random.Random(SEED).sample(ids, min(n, len(ids)))
+    rows = (
+        table.search()
+        .where(video_index.dvdid_in_filter(sample))
+        .select(["dvdid", "title", "vector"])
+        .limit(len(sample) * 2)
+        .to_arrow()
+        .to_pylist()
+    )
+    rows = list({row["dvdid"]: row for row in rows}.values())
+
+    if source == "vectors":
+        return np.asarray([row["vector"] for row in rows], dtype=np.float32)
+
+    from encoder import load_model
+
+    print(f"🧠 Embedding {len(rows)} titles with {MODEL_NAME} ({backend})...")
+    model = load_model(MODEL_NAME, backend)
+    texts = [QUERY_PREFIX + " ".join(str(row["title"]).split()) for row in rows]
+    return model.encode(texts, normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+
+def timed_queries(build_query, vectors, columns, k):
+    """Runs one query per vector; returns (dvdid sets, latencies in ms)."""
+    for vec in vectors[:WARMUP_QUERIES]:
+        build_query(vec).select(columns).limit(k).to_arrow()
+
+    hits = []
+    latencies = []
+    for vec in vectors:
+        started = time.perf_counter()
+        results = build_query(vec).select(columns).limit(k).to_arrow()
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits.append(set(results["dvdid"].to_pylist()))
+    return hits, np.asarray(latencies)
+
+
+def ann_builder(table, nprobes, refine_factor):
+    """The same query main.ann_query builds."""
+
+    def build(vec):
+        query = table.search(vec).nprobes(nprobes)
+        if refine_factor:
+            query = query.refine_factor(refine_factor)
+        return query
+
+    return build
+
+
+def print_row(label, recall, latencies):
+    print(
+        f"{label:<18} {recall:9.4f} {np.percentile(latencies, 50):8.2f}ms {np.percentile(latencies, 99):8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of the IVF-PQ index over nprobes / refine_factor.")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=NPROBES)
+    parser.add_argument("--refine-factors", type=int, nargs="+", default=REFINE_FACTORS, help="0 = no refine step")
+    parser.add_argument("--source", choices=["vectors", "titles"], default="vectors",
+                        help="Query with stored video vectors or with embedded titles (needs the model)")
+    parser.add_argument("--backend", default="torch", help="Encoder backend for --source titles")
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+    args = parser.parse_args()
+
+    table = lancedb.connect(DB_FOLDER).open_table(TABLE_NAME)
+    print(f"📚 {TABLE_NAME}: {len(table)} videos")
+    if not video_index.has_vector_index(table):
+        print("⚠️ No vector index on this table: every query is already exact, so there is nothing to tune.")
+
+    columns = [name for name in table.schema.names if name not in SKIP_COLUMNS]
+    vectors = sample_queries(table, args.queries, args.source, args.backend)
+    print(f"🔍 {len(vectors)} queries ({args.source}), recall@{args.k}\n")
+
+    # Ground truth: a flat scan over every row, no index involved
+    def exact(vec):
+        return table.search(vec).bypass_vector_index().distance_type(VECTOR_METRIC)
+
+    truth, exact_latencies = timed_queries(exact, vectors, columns, args.k)
+
+    print(f"{'setting':<18} {'recall':>9} {'p50':>10} {'p99':>10}")
+    print_row("exact (flat)", 1.0, exact_latencies)
+
+    sweep = []
+    for refine_factor in args.refine_factors:
+        for nprobes in args.nprobes:
+            hits, latencies = timed_queries(ann_builder(table, nprobes, refine_factor), vectors, columns, args.k)
+            recall = float(np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t]))
+            label = f"nprobes={nprobes}" + (f" rf={refine_factor}" if refine_factor else "")
+            print_row(label, recall, latencies)
+            sweep.append((float(np.percentile(latencies, 50)), recall, nprobes, refine_factor))
+
+    good = [entry for entry in sweep if entry[1] >= args.target_recall]
+    if not good:
+        print(f"\n⚠️ No setting reached recall {args.target_recall}; try more nprobes or a refine factor.")
+        return
+    p50, recall, nprobes, refine_factor = min(good)
+    print(f"\n✅ Fastest at recall >= {args.target_recall}: nprobes={nprobes}, refine_factor={refine_factor or 'off'}")
+    print(f"   recall {recall:.4f}, p50 {p50:.2f}ms  ->  ANN_NPROBES={nprobes} ANN_REFINE_FACTOR={refine_factor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import random
+import time
+import urllib.parse
+import urllib.request
+
+# --- CONFIGURATION ---
+SERVER = "http://127.0.0.1:8000"
+NUM_QUERIES = 500
+BATCH_SIZE = 250  # Queries per /api/search/batch call
+SEED = 42
+
+FILLER = ["office", "summer", "vacation", "teacher", "tall", "lady", "boss", "drama", "4k",
+          "school", "uniform", "beach", "hotel", "wife", "sister", "rain", "night", "trip"]
+
+
+def build_queries(rng, n):
+    """Mostly semantic queries with a few IDs mixed in, like the nightly saved searches."""
+    queries = []
+    for i in range(n):
+        if rng.random() < 0.1:
+            queries.append(f"SSNI-{rng.randint(1, 999)}")
+        else:
+            # The index keeps them unique, so the embedding cache can't flatter either side
+            queries.append(" ".join(rng.sample(FILLER, rng.randint(1, 3))) + f" {i}")
+    return queries
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_single(server, queries, top_k):
+    started = time.perf_counter()
+    for q in queries:
+        params = urllib.parse.urlencode({"q": q, "top_k": top_k})
+        with urllib.request.urlopen(f"{server}/api/search?{params}") as response:
+            json.loads(response.read())
+    return time.perf_counter() - started
+
+
+def run_batch(server, queries, top_k, batch_size):
+    started = time.perf_counter()
+    for start in range(0, len(queries), batch_size):
+        chunk = queries[start : start + batch_size]
+        body = post_json(f"{server}/api/search/batch", {"queries": [{"q": q, "top_k": top_k} for q in chunk]})
+        assert body["count"] == len(chunk)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queries/sec: one-at-a-time /api/search vs /api/search/batch.")
+    parser.add_argument("--server", default=SERVER)
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    # Separate query sets so the second run doesn't hit the first run's cached embeddings
+    single_queries = build_queries(rng, args.queries)
+    batch_queries = [q + " b" for q in build_queries(rng, args.queries)]
+
+    print(f"🔌 {args.server}: {args.queries} queries, top_k={args.top_k}")
+
+    single_s = run_single(args.server, single_queries, args.top_k)
+    print(f"   /api/search        {args.queries / single_s:8.1f} q/s  ({single_s:.2f}s)")
+
+    batch_s = run_batch(args.server, batch_queries, args.top_k, args.batch_size)
+    print(f"   /api/search/batch  {args.queries / batch_s:8.1f} q/s  ({batch_s:.2f}s, {args.batch_size}/call)")
+
+    print(f"\n✅ Batch endpoint is {single_s / batch_s:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# --- CONFIGURATION ---
+SERVER = "http://127.0.0.1:8000"
+ACTRESS_DB_FILE = "actress_db.json"
+PROBES = 300  # Cheap requests timed per phase
+PROBE_INTERVAL = 0.01  # Seconds between probes
+HEAVY_CLIENTS = 8  # Concurrent clients sending slow queries during the load phase
+HEAVY_TOP_K = 50  # Modest result sets: the time goes into the scans, not into JSON
+SEED = 42
+
+FILLER = ["office", "summer", "vacation", "teacher", "tall", "lady", "boss", "drama", "4k",
+          "school", "uniform", "beach", "hotel", "wife", "sister", "rain", "night", "trip"]
+
+
+def get(server, params, path="/api/search"):
+    started = time.perf_counter()
+    with urllib.request.urlopen(f"{server}{path}?{urllib.parse.urlencode(params)}") as response:
+        json.loads(response.read())
+    return (time.perf_counter() - started) * 1000
+
+
+def probe_params(rng, i):
+    # Exact-ID lookups; the index makes every one unique, so none is a result-cache hit
+    return {"q": f"SSNI-{rng.randint(1, 999)}", "top_k": 5 + i % 50, "threshold": 0.65}
+
+
+def heavy_params(rng, i, actresses):
+    # Actress timelines and wide semantic searches, alternately; also never cached
+    threshold = round(rng.random() * 0.1, 6)
+    if actresses and i % 2:
+        return {"q": rng.choice(actresses), "top_k": HEAVY_TOP_K, "threshold": threshold}
+    text = " ".join(rng.sample(FILLER, 3)) + f" {i}"
+    return {"q": text, "top_k": HEAVY_TOP_K, "threshold": threshold}
+
+
+def run_probes(server, n, interval, seed):
+    """
+    Alternates ID lookups with /healthz, which touches nothing but the event
+    loop: if that is slow, every websocket on the worker is frozen too.
+    Returns (ID lookup ms, healthz ms).
+    """
+    rng = random.Random(seed)
+    lookups, loop = [], []
+    for i in range(n):
+        lookups.append(get(server, probe_params(rng, i)))
+        time.sleep(interval)
+        loop.append(get(server, {}, "/healthz"))
+        time.sleep(interval)
+    return np.asarray(lookups), np.asarray(loop)
+
+
+def heavy_client(server, client_id, actresses, stop, latencies):
+    rng = random.Random(SEED + client_id)
+    i = client_id * 1_000_000
+    while not stop.is_set():
+        latencies.append(get(server, heavy_params(rng, i, actresses)))
+        i += 1
+
+
+def report(label, latencies):
+    print(
+        f"   {label:<24} p50 {np.percentile(latencies, 50):8.1f}ms   p99 {np.percentile(latencies, 99):8.1f}ms"
+        f"   max {latencies.max():8.1f}ms   ({len(latencies)} requests)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of cheap ID lookups while slow queries are in flight.")
+    parser.add_argument("--server", default=SERVER)
+    parser.add_argument("--probes", type=int, default=PROBES)
+    parser.add_argument("--heavy-clients", type=int, default=HEAVY_CLIENTS)
+    args = parser.parse_args()
+
+    try:
+        with open(ACTRESS_DB_FILE, "r", encoding="utf-8") as f:
+            actresses = json.load(f)
+    except FileNotFoundError:
+        actresses = []
+
+    print(f"🔌 {args.server}: {args.probes} ID lookups per phase, {args.heavy_clients} heavy clients under load")
+
+    # Warm-up: model, caches and lanes
+    get(args.server, {"q": "office warm up", "top_k": 5})
+    run_probes(args.server, 10, 0, SEED + 999)
+
+    idle, idle_loop = run_probes(args.server, args.probes, PROBE_INTERVAL, SEED)
+
+    stop = threading.Event()
+    heavy = []
+    with ThreadPoolExecutor(args.heavy_clients) as pool:
+        for client_id in range(args.heavy_clients):
+            pool.submit(heavy_client, args.server, client_id + 1, actresses, stop, heavy)
+        time.sleep(1.0)  # Let the slow queries pile up first
+        loaded, loaded_loop = run_probes(args.server, args.probes, PROBE_INTERVAL, SEED + 1)
+        stop.set()
+    heavy = np.asarray(heavy)
+
+    print()
+    report("healthz, idle", idle_loop)
+    report("healthz, under load", loaded_loop)
+    report("ID lookups, idle", idle)
+    report("ID lookups, under load", loaded)
+    report("heavy queries", heavy)
+
+    heavy_p50 = np.percentile(heavy, 50)
+    print(f"\n✅ Under load, p99 is {np.percentile(loaded_loop, 99) / heavy_p50:.2f}x the heavy queries' p50 for healthz")
+    print(f"   and {np.percentile(loaded, 99) / heavy_p50:.2f}x for ID lookups. Well below 1x: cheap requests don't wait")
+    print("   for the slow ones. ID lookups near 1x with a fast healthz: the CPU is saturated, not the event loop.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from embed_service import probe
+
+# --- CONFIGURATION ---
+PORT = 8100
+WORKERS = [1, 2, 4]
+MODES = ["service", "inprocess"]
+SOCKET_PATH = "bench_embed.sock"
+NUM_QUERIES = 400  # Per run; all unique, so every one is encoded
+CLIENTS = 16  # Concurrent HTTP clients
+READY_TIMEOUT = 900  # Seconds for every worker to come up (in-process, each loads the model)
+SEED = 42
+
+FILLER = ["office", "summer", "vacation", "teacher", "tall", "lady", "boss", "drama", "4k",
+          "school", "uniform", "beach", "hotel", "wife", "sister", "rain", "night", "trip"]
+
+
+def get(url):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        response.read()
+    return (time.perf_counter() - started) * 1000
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def children(pid):
+    """Direct child processes of pid (the uvicorn workers), from /proc."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The parent pid comes after the ")" closing the command name
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    found.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return found
+
+
+def wait_ready(server, workers, timeout):
+    """Until /readyz reports the model ready several times in a row, so every worker has loaded."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{server} not ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(f"{server}/readyz") as response:
+                ready = b'"model":"ready"' in response.read()
+        except (urllib.error.URLError, ConnectionError):
+            ready = False
+        streak = streak + 1 if ready else 0
+        time.sleep(0.05 if ready else 0.5)
+
+
+def run_load(server, queries, clients):
+    """(queries/sec, latencies in ms) for unique semantic queries from `clients` threads."""
+    urls = [f"{server}/api/search?{urllib.parse.urlencode({'q': q, 'top_k': 20})}" for q in queries]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(get, urls))
+    return len(urls) / (time.perf_counter() - started), np.asarray(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic-query throughput and RSS from 1 to N uvicorn workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKERS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES,
+                        help="service: one embed_service.py for all workers; inprocess: a model per worker")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    server = f"http://127.0.0.1:{args.port}"
+    rng = random.Random(SEED)
+    print(f"🔌 {args.queries} unique semantic queries per run, {args.clients} clients, workers {args.workers}\n")
+
+    rows = []
+    for mode in args.modes:
+        service = None
+        if mode == "service":
+            service = subprocess.Popen([sys.executable, "embed_service.py", "--socket", SOCKET_PATH])
+            while probe(SOCKET_PATH) is None:
+                if service.poll() is not None:
+                    raise RuntimeError("embed_service.py exited")
+                time.sleep(0.5)
+
+        baseline = None
+        for workers in args.workers:
+            env = dict(os.environ, EMBED_SOCKET=SOCKET_PATH if mode == "service" else "")
+            uvicorn = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                env=env, stdout=subprocess.DEVNULL,
+            )
+            try:
+                print(f"⏳ {mode}, {workers} worker(s): loading...")
+                wait_ready(server, workers, READY_TIMEOUT)
+                # Every worker: warm-up; the filler index keeps every query unique
+                run_load(server, [f"warm up {mode} {workers} {i}" for i in range(8 * workers)], args.clients)
+                queries = [" ".join(rng.sample(FILLER, 3)) + f" {mode} {workers} {i}" for i in range(args.queries)]
+                qps, latencies = run_load(server, queries, args.clients)
+
+                # With one worker uvicorn serves in its own process
+                worker_rss = sum(rss_mb(pid) for pid in children(uvicorn.pid) or [uvicorn.pid])
+                service_rss = rss_mb(service.pid) if service else 0.0
+                baseline = baseline or qps
+                rows.append((mode, workers, qps, latencies, worker_rss, service_rss, qps / baseline))
+            finally:
+                uvicorn.terminate()
+                uvicorn.wait()
+
+        if service:
+            service.terminate()
+            service.wait()
+
+    print(f"\n{'mode':<10} {'workers':>7} {'q/s':>8} {'p50':>9} {'p99':>9} {'workers RSS':>12} {'service RSS':>12} {'scaling':>8}")
+    for mode, workers, qps, latencies, worker_rss, service_rss, scaling in rows:
+        print(
+            f"{mode:<10} {workers:7d} {qps:8.1f} {np.percentile(latencies, 50):7.1f}ms {np.percentile(latencies, 99):7.1f}ms "
+            f"{worker_rss:10.0f}MB {service_rss:10.0f}MB {scaling:7.2f}x"
+        )
+    print(f"\n✅ Scaling is q/s against 1 worker of the same mode; this machine has {os.cpu_count()} cores.")
+
+
+if __name__ == "__main__":
+    main()
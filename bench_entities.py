@@ -0,0 +1,94 @@
+import random
+import re
+import string
+import time
+import tracemalloc
+
+from name_index import ActressIndex
+
+# --- CONFIGURATION ---
+DB_SIZES = [10_000, 50_000, 100_000]
+NUM_QUERIES = 200
+LEGACY_QUERIES = 20  # The old loop is slow enough that a sample is plenty
+SEED = 42
+
+SYLLABLES = ["a", "i", "u", "e", "o", "ka", "ki", "ku", "sa", "shi", "ta", "chi", "na",
+             "ni", "ha", "hi", "ma", "mi", "yu", "ri", "ra", "ru", "n", "ko", "to", "mo"]
+FILLER = ["office", "summer", "vacation", "teacher", "tall", "lady", "boss", "drama", "4k"]
+
+
+def random_name(rng):
+    def word():
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))).capitalize()
+
+    return f"{word()} {word()}" if rng.random() < 0.7 else word()
+
+
+def build_names(rng, size):
+    names = set()
+    while len(names) < size:
+        names.add(random_name(rng))
+    names = list(names)
+    names.sort(key=len, reverse=True)
+    return names
+
+
+def build_queries(rng, names):
+    queries = []
+    for _ in range(NUM_QUERIES):
+        parts = rng.sample(FILLER, rng.randint(0, 3))
+        for _ in range(rng.choice([0, 1, 1, 2])):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(names))
+        if not parts:
+            parts = ["".join(rng.choice(string.ascii_lowercase) for _ in range(8))]
+        queries.append(" ".join(parts).lower())
+    return queries
+
+
+def legacy_extract(cleaned_query, names):
+    """The pre-automaton phase 2 loop from main.extract_entities."""
+    found = []
+    for name in names:
+        if name.lower() in cleaned_query:
+            found.append(name)
+            cleaned_query = re.sub(re.escape(name.lower()), "", cleaned_query, flags=re.IGNORECASE)
+    return cleaned_query, found
+
+
+def main():
+    rng = random.Random(SEED)
+
+    print(f"{'names':>8} | {'build':>8} | {'memory':>8} | {'legacy/query':>13} | {'automaton/query':>15} | {'speed-up':>8}")
+    print("-" * 78)
+
+    for size in DB_SIZES:
+        names = build_names(rng, size)
+        queries = build_queries(rng, names)
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        index = ActressIndex(names)
+        build_s = time.perf_counter() - t0
+        memory_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        legacy = [legacy_extract(q, names) for q in queries[:LEGACY_QUERIES]]
+        legacy_ms = (time.perf_counter() - t0) * 1000 / LEGACY_QUERIES
+
+        t0 = time.perf_counter()
+        fast = [index.extract_exact(q) for q in queries]
+        fast_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+        if legacy != fast[:LEGACY_QUERIES]:
+            print(f"❌ Results differ from the legacy loop at {size} names!")
+            return
+
+        print(f"{size:>8} | {build_s:>7.2f}s | {memory_mb:>6.1f}MB | {legacy_ms:>10.2f} ms | "
+              f"{fast_ms:>12.4f} ms | {legacy_ms / fast_ms:>7.0f}x")
+
+    print("\n✅ Automaton results identical to the legacy loop.")
+
+
+if __name__ == "__main__":
+    main()
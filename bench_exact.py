@@ -0,0 +1,103 @@
+import argparse
+import os
+import tempfile
+import time
+
+import lancedb
+import numpy as np
+
+import video_index
+from bench_ann import SKIP_COLUMNS, VECTOR_METRIC, ann_builder, sample_queries, timed_queries
+from exact_index import VECTORS_FILE, ExactIndex, attach_rows, export
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+NUM_QUERIES = 200
+K = 60  # main.py fetches 3 x top_k candidates; top_k defaults to 20
+NPROBES = 20  # Keep in sync with main.ANN_NPROBES
+DTYPES = ["float16", "float32"]
+WARMUP_QUERIES = 5
+
+
+def timed_exact(index, table, vectors, columns, k):
+    """
+    Exact backend the way main.exact_candidates runs it.
+    Returns (dvdid sets, search-only ms, search + row fetch ms).
+    """
+    for vec in vectors[:WARMUP_QUERIES]:
+        index.search(vec, k)
+
+    hits, search_ms, total_ms = [], [], []
+    for vec in vectors:
+        started = time.perf_counter()
+        dvdids, distances = index.search(vec, k)
+        searched = time.perf_counter()
+        attach_rows(table, dvdids, distances, columns)
+        search_ms.append((searched - started) * 1000)
+        total_ms.append((time.perf_counter() - started) * 1000)
+        hits.append(set(dvdids))
+    return hits, np.asarray(search_ms), np.asarray(total_ms)
+
+
+def recall(hits, truth):
+    return float(np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t]))
+
+
+def print_row(label, value, latencies, note=""):
+    print(
+        f"{label:<24} {value:9.4f} {np.percentile(latencies, 50):8.2f}ms {np.percentile(latencies, 99):8.2f}ms  {note}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact memory-mapped search vs the LanceDB vector index.")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--nprobes", type=int, default=NPROBES)
+    parser.add_argument("--refine-factor", type=int, default=0, help="0 = no refine step")
+    parser.add_argument("--dtypes", nargs="+", choices=DTYPES, default=DTYPES)
+    parser.add_argument("--source", choices=["vectors", "titles"], default="vectors",
+                        help="Query with stored video vectors or with embedded titles (needs the model)")
+    parser.add_argument("--backend", default="torch", help="Encoder backend for --source titles")
+    args = parser.parse_args()
+
+    table = lancedb.connect(DB_FOLDER).open_table(TABLE_NAME)
+    print(f"📚 {TABLE_NAME}: {len(table)} videos")
+    if not video_index.has_vector_index(table):
+        print("⚠️ No vector index on this table: the LanceDB rows below are a flat scan, not IVF-PQ.")
+
+    columns = [name for name in table.schema.names if name not in SKIP_COLUMNS]
+    vectors = sample_queries(table, args.queries, args.source, args.backend)
+    print(f"🔍 {len(vectors)} queries ({args.source}), recall@{args.k}\n")
+
+    def flat(vec):
+        return table.search(vec).bypass_vector_index().distance_type(VECTOR_METRIC)
+
+    truth, flat_ms = timed_queries(flat, vectors, columns, args.k)
+    ann_hits, ann_ms = timed_queries(ann_builder(table, args.nprobes, args.refine_factor), vectors, columns, args.k)
+
+    print(f"{'backend':<24} {'recall':>9} {'p50':>10} {'p99':>10}")
+    print_row("lancedb flat", 1.0, flat_ms, "(ground truth)")
+    label = f"lancedb ann nprobes={args.nprobes}" + (f" rf={args.refine_factor}" if args.refine_factor else "")
+    print_row(label, recall(ann_hits, truth), ann_ms)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in args.dtypes:
+            folder = os.path.join(tmp, dtype)
+            started = time.perf_counter()
+            export(table, folder, dtype)
+            export_s = time.perf_counter() - started
+            size_mb = os.path.getsize(os.path.join(folder, VECTORS_FILE)) / 1e6
+
+            index = ExactIndex(folder)
+            hits, search_ms, total_ms = timed_exact(index, table, vectors, columns, args.k)
+            print_row(f"exact {dtype} (search)", recall(hits, truth), search_ms, f"{size_mb:.0f} MB, export {export_s:.1f}s")
+            print_row(f"exact {dtype} (+rows)", recall(hits, truth), total_ms)
+            del index
+
+    print("\n✅ Compare p50 at equal recall; 'exact' recall below 1.0 is float16 rounding reordering near-ties.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from lancedb.index import BTree
+
+import main as server
+import video_index
+
+# --- CONFIGURATION ---
+PREFIX = "IPX"
+LONG_IDS = 1500  # IPX-1000 .. IPX-2499: far more prefix matches for "IPX-1" than one page
+SHORT_IDS = range(10, 20)  # IPX-10 .. IPX-19, written after the long ones
+TOP_K = 20
+REPEATS = 50
+
+
+def build_table(folder):
+    """Long IDs first in storage order, so a capped scan would only ever see them."""
+    ids = [f"{PREFIX}-{n}" for n in range(1000, 1000 + LONG_IDS)] + [f"{PREFIX}-{n}" for n in SHORT_IDS] + [f"{PREFIX}-1"]
+    table = lancedb.connect(folder).create_table("videos", pa.table({
+        "dvdid": ids,
+        "title": [f"title {i}" for i in ids],
+        video_index.ACTRESS_LIST_COLUMN: [[] for _ in ids],
+        video_index.DVDID_KEY_COLUMN: [video_index.dvdid_key(i) for i in ids],
+    }))
+    table.create_index(video_index.DVDID_KEY_COLUMN, config=BTree(), replace=True)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact-ID lookups: closest IDs first, however many share the prefix.")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        table = build_table(folder)
+        server.resources["result_columns"] = ["dvdid", "title"]
+        print(f"📚 {len(table)} IDs, {LONG_IDS} of them 4+ digits and stored first\n")
+
+        # The exact ID, then the 2-digit ones, then the 4-digit ones
+        got = [r["data"]["dvdid"] for r in server.find_by_dvdid(table, f"{PREFIX}-1", args.top_k)]
+        expected = [f"{PREFIX}-1"] + [f"{PREFIX}-{n}" for n in SHORT_IDS] + [f"{PREFIX}-{n}" for n in range(1000, 1000 + LONG_IDS)]
+        assert got == expected[: args.top_k], got
+        assert [r["data"]["dvdid"] for r in server.find_by_dvdid(table, f"{PREFIX}-1042", 5)] == [f"{PREFIX}-1042"]
+        assert server.find_by_dvdid(table, f"{PREFIX}-9", 5) == []
+
+        latencies = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            server.find_by_dvdid(table, f"{PREFIX}-1", args.top_k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"⏱️ '{PREFIX}-1', top {args.top_k}: p50 {np.percentile(latencies, 50):.2f}ms, p99 {np.percentile(latencies, 99):.2f}ms")
+        print(f"\n✅ '{PREFIX}-1' returns itself, then {PREFIX}-10..19, then the 4-digit IDs.")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
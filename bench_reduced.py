@@ -0,0 +1,85 @@
+import argparse
+import os
+import tempfile
+import time
+
+import lancedb
+import numpy as np
+
+from bench_ann import sample_queries
+from exact_index import REDUCE_METHODS, REDUCED_FILE, ExactIndex, export, export_reduced
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+NUM_QUERIES = 200
+K = 60  # main.py fetches 3 x top_k candidates; top_k defaults to 20
+DIMS = [128, 256, 384]
+OVERSAMPLE = [2, 4, 8]  # Reduced-stage candidates per result
+WARMUP_QUERIES = 5
+
+
+def timed_search(index, vectors, k):
+    """(dvdid sets, latencies in ms) of ExactIndex.search, candidate ids only."""
+    for vec in vectors[:WARMUP_QUERIES]:
+        index.search(vec, k)
+
+    hits, latencies = [], []
+    for vec in vectors:
+        started = time.perf_counter()
+        dvdids, _ = index.search(vec, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits.append(set(dvdids))
+    return hits, np.asarray(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall loss and speed-up of the reduced-dimension first stage.")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--methods", nargs="+", choices=REDUCE_METHODS, default=REDUCE_METHODS)
+    parser.add_argument("--dims", type=int, nargs="+", default=DIMS)
+    parser.add_argument("--oversample", type=int, nargs="+", default=OVERSAMPLE)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--source", choices=["vectors", "titles"], default="titles",
+                        help="Query with embedded titles (needs the model) or stored video vectors")
+    parser.add_argument("--backend", default="torch", help="Encoder backend for --source titles")
+    args = parser.parse_args()
+
+    table = lancedb.connect(DB_FOLDER).open_table(TABLE_NAME)
+    print(f"📚 {TABLE_NAME}: {len(table)} videos")
+    vectors = sample_queries(table, args.queries, args.source, args.backend)
+    print(f"🔍 {len(vectors)} queries ({args.source}), recall@{args.k} against the full-dimension exact search\n")
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"📤 Exporting {args.dtype} vectors...")
+        export(table, folder, args.dtype)
+        truth, full_ms = timed_search(ExactIndex(folder), vectors, args.k)
+        full_p50 = np.percentile(full_ms, 50)
+
+        print(f"\n{'setting':<24} {'recall':>9} {'p50':>10} {'p99':>10} {'speed-up':>9} {'size':>8}")
+        print(f"{'full':<24} {1.0:9.4f} {full_p50:8.2f}ms {np.percentile(full_ms, 99):8.2f}ms {1.0:8.1f}x")
+
+        for method in args.methods:
+            for dims in args.dims:
+                dims = export_reduced(folder, method, dims)
+                size_mb = os.path.getsize(os.path.join(folder, REDUCED_FILE)) / 1e6
+                index = ExactIndex(folder, use_reduced=True)
+                for oversample in args.oversample:
+                    index.oversample = oversample
+                    hits, latencies = timed_search(index, vectors, args.k)
+                    recall = float(np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t]))
+                    p50 = np.percentile(latencies, 50)
+                    label = f"{method} {dims}d x{oversample}"
+                    print(
+                        f"{label:<24} {recall:9.4f} {p50:8.2f}ms {np.percentile(latencies, 99):8.2f}ms "
+                        f"{full_p50 / p50:8.1f}x {size_mb:6.0f}MB"
+                    )
+                del index
+
+    print("\n✅ Export the chosen setting with `exact_index.py --reduce METHOD --dims N`, set RERANK_OVERSAMPLE")
+    print("   in exact_index.py to the chosen factor, and start main.py with EXACT_REDUCED=1.")
+
+
+if __name__ == "__main__":
+    main()
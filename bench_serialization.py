@@ -0,0 +1,102 @@
+import argparse
+import json
+import time
+
+import lancedb
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+import ranking
+import serialization
+from bench_ann import SKIP_COLUMNS
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+RESULTS = 100  # Results per payload
+REPEATS = 200
+WARMUP = 10
+
+
+def legacy_records(results):
+    """Timeline records the way main.py built them before: pandas rows, one by one."""
+    df = results.to_pandas()
+    df["releasedate"] = pd.to_datetime(df["releasedate"], errors="coerce")
+    df = df.sort_values(by="releasedate", ascending=False)
+    records = []
+    for _, row in df.iterrows():
+        row_dict = row.replace({pd.NA: None}).to_dict()
+        if row_dict.get("releasedate"):
+            row_dict["releasedate"] = str(row_dict["releasedate"]).split(" ")[0]
+        records.append({"data": row_dict, "score": 10.0, "sem_score": 1.0})
+    return records
+
+
+def arrow_records(results):
+    return [{"data": row, "score": 10.0, "sem_score": 1.0} for row in serialization.latest_first(results, len(results))]
+
+
+def legacy_dumps(payload):
+    # FastAPI's JSONResponse: jsonable_encoder, then json.dumps
+    payload = jsonable_encoder(payload)
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, repeats):
+    for _ in range(WARMUP):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.asarray(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization time per 100 results: jsonable_encoder + json vs orjson.")
+    parser.add_argument("--results", type=int, default=RESULTS)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    table = lancedb.connect(DB_FOLDER).open_table(TABLE_NAME)
+    columns = [name for name in table.schema.names if name not in SKIP_COLUMNS]
+    results = table.search().select(columns).limit(args.results).to_arrow()
+    print(f"📚 {TABLE_NAME}: {results.num_rows} results per payload, {args.repeats} runs\n")
+
+    # Semantic results: records come from Arrow either way, only the encoding differs
+    scores = np.linspace(1.0, 0.5, results.num_rows)
+    semantic = {"mode": "Semantic", "detected_cast": [], "results": ranking.scored_records(
+        results, np.arange(results.num_rows), scores, scores
+    )}
+    legacy_semantic = timed(lambda: legacy_dumps(semantic), args.repeats)
+    orjson_semantic = timed(lambda: serialization.dumps(semantic), args.repeats)
+
+    # Actress timeline: the rows, date parsing and encoding together
+    def legacy_timeline():
+        return legacy_dumps({"mode": "Actress Timeline (Latest)", "results": legacy_records(results)})
+
+    def orjson_timeline():
+        return serialization.dumps({"mode": "Actress Timeline (Latest)", "results": arrow_records(results)})
+
+    assert json.loads(legacy_timeline()) == json.loads(orjson_timeline())
+    legacy_tl = timed(legacy_timeline, args.repeats)
+    orjson_tl = timed(orjson_timeline, args.repeats)
+
+    scale = 100 / results.num_rows
+    print(f"{'payload':<30} {'p50 / 100 results':>18} {'p99':>10}")
+    for label, latencies in [
+        ("semantic, jsonable_encoder", legacy_semantic),
+        ("semantic, orjson", orjson_semantic),
+        ("timeline, pandas rows + json", legacy_tl),
+        ("timeline, Arrow rows + orjson", orjson_tl),
+    ]:
+        print(f"{label:<30} {np.percentile(latencies, 50) * scale:16.3f}ms {np.percentile(latencies, 99) * scale:8.3f}ms")
+
+    print(f"\n✅ orjson is {np.median(legacy_semantic) / np.median(orjson_semantic):.1f}x faster on semantic results "
+          f"and {np.median(legacy_tl) / np.median(orjson_tl):.1f}x on timelines (same JSON).")
+
+
+if __name__ == "__main__":
+    main()
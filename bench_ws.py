@@ -0,0 +1,97 @@
+import argparse
+import json
+import random
+import re
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main as server
+
+# --- CONFIGURATION ---
+NUM_REQUESTS = 200  # Similarity requests per batch size
+TOP_K = 100
+THRESHOLD = -1.0  # Below any cosine score: every request streams top_k matches
+BATCH_SIZES = [1, 10, 50, 100]
+WARMUP_REQUESTS = 10
+SEED = 42
+STREAMING_SUM = re.compile(r'^jav_search_stage_seconds_sum\{stage="ws_streaming",[^}]*\} (\S+)$', re.M)
+
+
+def streaming_seconds(client):
+    """Total time of the ws_streaming stage (encode + send) so far, from /metrics."""
+    match = STREAMING_SUM.search(client.get("/metrics").text)
+    return float(match.group(1)) if match else 0.0
+
+
+def similar(ws, request_id, dvd_id, top_k, threshold, batch_size):
+    """One request on the session; returns (matches, frames) received."""
+    ws.send_text(json.dumps(
+        {"request_id": request_id, "dvd_id": dvd_id, "top_k": top_k, "threshold": threshold, "batch_size": batch_size}
+    ))
+    matches = frames = 0
+    while True:
+        msg = json.loads(ws.receive_text())
+        frames += 1
+        if msg["type"] == "match":
+            matches += 1
+        elif msg["type"] == "matches":
+            matches += len(msg["data"])
+        elif msg["type"] in ("done", "error"):
+            return matches, frames
+
+
+def run(client, ids, top_k, threshold, batch_size):
+    """(process CPU ms, streaming-stage ms, frames) per request."""
+    with client.websocket_connect("/ws/similar") as ws:
+        for i, dvd_id in enumerate(ids[:WARMUP_REQUESTS]):
+            similar(ws, i, dvd_id, top_k, threshold, batch_size)
+
+        cpu_ms, frames = [], []
+        streamed = streaming_seconds(client)
+        for i, dvd_id in enumerate(ids):
+            started = time.process_time()
+            _, received = similar(ws, i, dvd_id, top_k, threshold, batch_size)
+            cpu_ms.append((time.process_time() - started) * 1000)
+            frames.append(received)
+        stage_ms = (streaming_seconds(client) - streamed) * 1000 / len(ids)
+    return np.asarray(cpu_ms), stage_ms, float(np.mean(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server CPU per /ws/similar request, by matches per frame.")
+    parser.add_argument("--requests", type=int, default=NUM_REQUESTS)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    args = parser.parse_args()
+
+    # In-process: uvicorn needs the websockets package to serve sockets, and this
+    # way the server's CPU is measurable. Both ends share the process, so the CPU
+    # column includes decoding the frames here as well.
+    with TestClient(server.app) as client:
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.5)
+
+        table = server.resources["table"]
+        ids = table.search().select(["dvdid"]).limit(None).to_arrow()["dvdid"].to_pylist()
+        ids = random.Random(SEED).sample(ids, min(args.requests, len(ids)))
+        print(f"📚 {len(table)} videos: {len(ids)} requests per row, top_k={args.top_k}, threshold={args.threshold}\n")
+
+        print(f"{'matches/frame':<14} {'frames':>7} {'CPU p50':>10} {'CPU mean':>10} {'streaming':>10}")
+        baseline = None
+        for batch_size in args.batch_sizes:
+            cpu_ms, stage_ms, frames = run(client, ids, args.top_k, args.threshold, batch_size)
+            baseline = baseline or cpu_ms.mean()
+            print(
+                f"{batch_size:<14} {frames:7.1f} {np.percentile(cpu_ms, 50):8.2f}ms {cpu_ms.mean():8.2f}ms "
+                f"{stage_ms:8.2f}ms   {baseline / cpu_ms.mean():.2f}x"
+            )
+
+    print("\n✅ CPU is per request, DB query included; 'streaming' is the encode-and-send stage alone.")
+    print("   Set WS_BATCH_SIZE for clients that don't ask, or send batch_size with each request.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# One process that owns the query model, for running main.py with several
+# uvicorn workers: each worker would otherwise load its own copy (2+ GB RSS).
+# Workers reach it over a local Unix socket; requests from all of them are
+# micro-batched by the same BatchEncoder main.py uses in-process. When no
+# service is listening, main.py loads the model itself as before.
+#
+# Wire format: every message is a 4-byte big-endian length and a body.
+# Request: JSON {"texts": [...]} (or {"info": true}). Reply: a JSON header
+# {"rows": n, "dim": d} followed by a message of n x d float32 values,
+# or a JSON {"error": "..."}.
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import struct
+
+import numpy as np
+import orjson
+
+from encoder import BACKENDS, MAX_BATCH_SIZE, MAX_WAIT_MS, BatchEncoder, load_model
+
+# --- CONFIGURATION ---
+MODEL_NAME = "intfloat/multilingual-e5-large"  # Keep in sync with main.py
+SOCKET_PATH = "embed_service.sock"
+CLIENT_CONNECTIONS = 8  # Sockets per worker, i.e. its requests in flight at once
+PROBE_TIMEOUT = 2.0  # Seconds a worker waits for the service at startup
+HEADER = struct.Struct("!I")
+
+
+async def read_message(reader):
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return await reader.readexactly(length)
+
+
+def write_message(writer, body):
+    writer.write(HEADER.pack(len(body)) + body)
+
+
+# --- SERVICE ---
+async def handle_connection(encoder, info, reader, writer):
+    """One worker socket: requests are answered in order, one at a time."""
+    try:
+        while True:
+            request = orjson.loads(await read_message(reader))
+            if request.get("info"):
+                write_message(writer, orjson.dumps(info))
+            else:
+                try:
+                    vectors = np.ascontiguousarray(await encoder.encode_many(request["texts"]), dtype=np.float32)
+                except Exception as e:
+                    write_message(writer, orjson.dumps({"error": str(e)}))
+                else:
+                    write_message(writer, orjson.dumps({"rows": vectors.shape[0], "dim": vectors.shape[1]}))
+                    write_message(writer, vectors.tobytes())
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        pass  # The worker went away, or the service is stopping
+    finally:
+        writer.close()
+
+
+async def serve(path, model, info, max_batch_size, max_wait_ms):
+    encoder = BatchEncoder(model, max_batch_size, max_wait_ms)
+    server = await asyncio.start_unix_server(lambda r, w: handle_connection(encoder, info, r, w), path=path)
+    os.chmod(path, 0o600)  # Only this user's workers
+    print(f"✅ Listening on {path} (batches of up to {max_batch_size}, {max_wait_ms}ms wait)")
+
+    # SIGTERM (systemd, docker stop) shuts down like Ctrl-C
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        encoder.close()
+
+
+# --- CLIENT ---
+def probe(path=SOCKET_PATH, timeout=PROBE_TIMEOUT):
+    """The service's info dict ({"model", "backend", "dim", "pid"}), or None if nothing answers."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            body = orjson.dumps({"info": True})
+            sock.sendall(HEADER.pack(len(body)) + body)
+            with sock.makefile("rb") as stream:
+                (length,) = HEADER.unpack(stream.read(HEADER.size))
+                return orjson.loads(stream.read(length))
+    except (OSError, struct.error, orjson.JSONDecodeError):
+        return None
+
+
+class EmbeddingClient:
+    """
+    Same interface as BatchEncoder (encode / encode_many / close), answered by
+    the service. Keeps up to `connections` sockets open, one request on each
+    at a time; the service batches across all of them and all workers.
+    """
+
+    def __init__(self, path=SOCKET_PATH, connections=CLIENT_CONNECTIONS):
+        self.path = path
+        self.connections = connections
+        self._idle = []  # (reader, writer)
+        self._slots = None  # Created on first use, on the server's event loop
+
+    async def encode(self, text):
+        vectors = await self.encode_many([text])
+        return vectors[0]
+
+    async def encode_many(self, texts):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.connections)
+        async with self._slots:
+            # A pooled socket may predate a service restart: drop it and try the next one
+            while True:
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                try:
+                    vectors = await self._exchange(reader, writer, texts)
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    if reused:
+                        continue
+                    raise ConnectionError(f"Embedding service at {self.path}: {e}") from e
+                except BaseException:
+                    writer.close()  # Cancelled or failed mid-reply: the socket's state is unknown
+                    raise
+                self._idle.append((reader, writer))
+                return vectors
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+    async def _connect(self):
+        try:
+            return await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            raise ConnectionError(f"Embedding service at {self.path}: {e}") from e
+
+    async def _exchange(self, reader, writer, texts):
+        write_message(writer, orjson.dumps({"texts": list(texts)}))
+        await writer.drain()
+        header = orjson.loads(await read_message(reader))
+        if "error" in header:
+            raise RuntimeError(f"Embedding service: {header['error']}")
+        body = await read_message(reader)
+        return np.frombuffer(body, dtype=np.float32).reshape(header["rows"], header["dim"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared query-embedding service for main.py workers.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get("ENCODER_BACKEND", "torch"))
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Texts per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="How long a query waits for company")
+    args = parser.parse_args()
+
+    if probe(args.socket) is not None:
+        print(f"⚠️ A service is already listening on {args.socket}")
+        return
+    if os.path.exists(args.socket):
+        os.remove(args.socket)  # Left behind by a service that didn't shut down cleanly
+
+    print(f"🧠 Loading {MODEL_NAME} ({args.backend})...")
+    model = load_model(MODEL_NAME, args.backend)
+    dim = model.encode(["warm up"], normalize_embeddings=True, show_progress_bar=False).shape[1]
+    info = {"model": MODEL_NAME, "backend": args.backend, "dim": int(dim), "pid": os.getpid()}
+
+    try:
+        asyncio.run(serve(args.socket, model, info, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        print("👋 Embedding service stopped")
+
+
+if __name__ == "__main__":
+    main()
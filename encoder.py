@@ -0,0 +1,136 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- CONFIGURATION ---
+MAX_BATCH_SIZE = 16  # Texts per forward pass; longer lists are encoded in chunks of this size
+MAX_WAIT_MS = 4  # How long the first query waits for company
+ONNX_DIR = "onnx_model"  # Written by export_encoder.py
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",  # fp32 export
+    "onnx-int8": "onnx/model_qint8.onnx",  # Dynamically quantized weights
+}
+BACKENDS = ["torch"] + list(ONNX_FILES)
+
+_STOP = object()
+
+
+def load_model(model_name, backend="torch", onnx_dir=ONNX_DIR):
+    """
+    The query model on the chosen backend. All of them are SentenceTransformer
+    objects with the same encode(), so BatchEncoder works with any of them.
+    """
+    # Imported here: a server using embed_service.py never loads torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend not in ONNX_FILES:
+        raise ValueError(f"Unknown encoder backend '{backend}' (expected one of {BACKENDS})")
+
+    file_name = ONNX_FILES[backend]
+    if not os.path.exists(os.path.join(onnx_dir, file_name)):
+        raise FileNotFoundError(f"{onnx_dir}/{file_name} missing, run export_encoder.py export")
+    return SentenceTransformer(
+        onnx_dir,
+        backend="onnx",
+        model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider"},
+    )
+
+
+class BatchEncoder:
+    """
+    Runs model.encode on a dedicated worker thread.
+    Queries that arrive within MAX_WAIT_MS of each other are gathered and
+    encoded in a single call, so the event loop never blocks on the model
+    and concurrent searches share one forward pass.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """Queue a list of texts. Returns a concurrent.futures.Future of their vectors."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    async def encode(self, text):
+        vectors = await asyncio.wrap_future(self.submit([text]))
+        return vectors[0]
+
+    async def encode_many(self, texts):
+        """
+        A list of texts. Longer lists go in max_batch_size chunks, each queued
+        once the last is done, so other queries get a turn in between.
+        """
+        texts = list(texts)
+        if len(texts) <= self.max_batch_size:
+            return await asyncio.wrap_future(self.submit(texts))
+        chunks = []
+        for start in range(0, len(texts), self.max_batch_size):
+            chunks.append(await asyncio.wrap_future(self.submit(texts[start : start + self.max_batch_size])))
+        return np.concatenate(chunks)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    # --- WORKER ---
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        # Drop requests whose caller already gave up
+        batch = [(texts, fut) for texts, fut in batch if fut.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            vectors = self.model.encode(
+                [text for texts, _ in batch for text in texts],
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+
+        start = 0
+        for texts, fut in batch:
+            fut.set_result(vectors[start : start + len(texts)])
+            start += len(texts)
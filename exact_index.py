@@ -0,0 +1,243 @@
+# Exact nearest-neighbour search over a memory-mapped copy of the `vector`
+# column. At a few hundred thousand rows a blocked matrix-vector product is
+# both faster and more accurate than the IVF-PQ index. main.py uses it with
+# SEARCH_BACKEND=exact; run this file once (and after every reindex) to export.
+# Optionally a reduced-dimension copy (PCA or truncation) picks the candidates
+# and only those are re-scored with the full vectors.
+
+import argparse
+import json
+import os
+import time
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+
+import video_index
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+EXACT_DIR = "exact_index"
+VECTORS_FILE = "vectors.npy"
+DVDIDS_FILE = "dvdids.npy"  # Row i of the matrix is video dvdids[i]
+META_FILE = "meta.json"
+REDUCED_FILE = "reduced.npy"
+PROJECTION_FILE = "projection.npz"  # PCA mean and components
+DTYPES = ["float16", "float32"]
+REDUCE_METHODS = ["pca", "truncate"]
+REDUCED_DIMS = 256
+PCA_SAMPLE = 20000  # Rows the PCA is fitted on
+RERANK_OVERSAMPLE = 4  # Reduced-stage candidates per result, re-scored with full vectors
+SEED = 42
+EXPORT_BATCH = 8192  # Rows read from LanceDB per step
+# Rows multiplied per step. float16 has no BLAS path, so each block is widened
+# to float32 first: BLOCK_ROWS x dim x 4 bytes of scratch per query.
+BLOCK_ROWS = 16384
+
+
+def export(table, folder=EXACT_DIR, dtype="float16"):
+    """Writes the vector matrix and the parallel dvdid array. Returns the row count."""
+    os.makedirs(folder, exist_ok=True)
+    total = table.count_rows()
+    dim = table.schema.field("vector").type.list_size
+    vectors = np.lib.format.open_memmap(
+        os.path.join(folder, VECTORS_FILE), mode="w+", dtype=dtype, shape=(total, dim)
+    )
+
+    dvdids = []
+    query = table.search().select(["dvdid", "vector"]).limit(None)
+    for batch in query.to_batches(EXPORT_BATCH):
+        if batch.num_rows == 0:
+            continue
+        # Stored normalized (normalize_embeddings=True), so a dot product is the cosine
+        chunk = np.stack(batch.column("vector").to_numpy(zero_copy_only=False))
+        vectors[len(dvdids) : len(dvdids) + len(chunk)] = chunk
+        dvdids.extend(batch.column("dvdid").to_pylist())
+    vectors.flush()
+    del vectors
+
+    np.save(os.path.join(folder, DVDIDS_FILE), np.array(dvdids, dtype=str))
+    write_meta(folder, {"rows": len(dvdids), "dim": dim, "dtype": dtype, "table_version": table.version})
+    return len(dvdids)
+
+
+def read_meta(folder):
+    with open(os.path.join(folder, META_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_meta(folder, meta):
+    with open(os.path.join(folder, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def export_reduced(folder=EXACT_DIR, method="pca", dims=REDUCED_DIMS):
+    """
+    Adds a reduced-dimension copy of an existing export, in the same dtype.
+    pca: projection onto the top `dims` principal components (fitted on a sample).
+    truncate: the first `dims` values, renormalized.
+    """
+    meta = read_meta(folder)
+    vectors = np.load(os.path.join(folder, VECTORS_FILE), mmap_mode="r")
+    dims = min(dims, meta["dim"])
+
+    mean = np.zeros(meta["dim"], dtype=np.float32)
+    components = None
+    if method == "pca":
+        rng = np.random.default_rng(SEED)
+        sample = np.sort(rng.choice(len(vectors), min(PCA_SAMPLE, len(vectors)), replace=False))
+        sample = vectors[sample].astype(np.float32)
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        components = vt[:dims].astype(np.float32)
+        np.savez(os.path.join(folder, PROJECTION_FILE), mean=mean, components=components)
+
+    reduced = np.lib.format.open_memmap(
+        os.path.join(folder, REDUCED_FILE), mode="w+", dtype=meta["dtype"], shape=(len(vectors), dims)
+    )
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = vectors[start : start + BLOCK_ROWS].astype(np.float32)
+        reduced[start : start + len(block)] = reduce_block(block, method, mean, components, dims)
+    reduced.flush()
+    del reduced
+
+    meta["reduced"] = {"method": method, "dims": dims}
+    write_meta(folder, meta)
+    return dims
+
+
+def reduce_block(block, method, mean, components, dims):
+    if method == "pca":
+        # q . x = q . mean + (C q) . (C (x - mean)) within the kept components;
+        # the first term is the same for every row, so only the rows are centred
+        return (block - mean) @ components.T
+    block = block[:, :dims]
+    return block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+
+
+def top_k_rows(matrix, query, k):
+    """(row numbers, scores) of the k highest dot products, in no particular order."""
+    # Best k of each block, then the best k of those
+    kept_scores, kept_rows = [], []
+    for start in range(0, len(matrix), BLOCK_ROWS):
+        scores = matrix[start : start + BLOCK_ROWS].astype(np.float32) @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        kept_scores.append(scores[top])
+        kept_rows.append(top + start)
+
+    scores = np.concatenate(kept_scores)
+    rows = np.concatenate(kept_rows)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[top], rows[top]
+    return rows, scores
+
+
+class ExactIndex:
+    """
+    Top-k by cosine over the exported matrix; pages are loaded on demand.
+    use_reduced=True searches the reduced copy first when one was exported.
+    """
+
+    def __init__(self, folder=EXACT_DIR, use_reduced=False):
+        self.meta = read_meta(folder)
+        self.vectors = np.load(os.path.join(folder, VECTORS_FILE), mmap_mode="r")
+        self.dvdids = np.load(os.path.join(folder, DVDIDS_FILE), mmap_mode="r")
+        self.oversample = RERANK_OVERSAMPLE
+
+        self.reduced = None
+        if use_reduced and "reduced" in self.meta:
+            self.reduced = np.load(os.path.join(folder, REDUCED_FILE), mmap_mode="r")
+            self.components = None
+            if self.meta["reduced"]["method"] == "pca":
+                self.components = np.load(os.path.join(folder, PROJECTION_FILE))["components"]
+
+    def __len__(self):
+        return len(self.dvdids)
+
+    def search(self, query_vec, k):
+        """
+        (dvdids, distances) of the k nearest rows, nearest first.
+        Distance is 1 - cosine, the same as LanceDB's cosine _distance.
+        """
+        query = np.asarray(query_vec, dtype=np.float32)
+        k = min(k, len(self))
+        if k <= 0:
+            return [], np.empty(0, dtype=np.float32)
+
+        if self.reduced is None:
+            rows, scores = top_k_rows(self.vectors, query, k)
+        else:
+            # Candidates from the reduced copy, final scores from the full vectors.
+            # The query's own scale doesn't change the order, so it isn't centred or renormalized.
+            if self.components is not None:
+                reduced_query = self.components @ query
+            else:
+                reduced_query = query[: self.reduced.shape[1]]
+            rows, _ = top_k_rows(self.reduced, reduced_query, min(k * self.oversample, len(self)))
+            rows = np.sort(rows)  # Ascending reads from the memory map
+            scores = self.vectors[rows].astype(np.float32) @ query
+            if k < len(scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+
+        order = np.argsort(-scores, kind="stable")
+        return [str(dvdid) for dvdid in self.dvdids[rows[order]]], 1.0 - scores[order]
+
+
+def attach_rows(table, dvdids, distances, columns):
+    """
+    The videos' `columns` from LanceDB in the given order, plus `_distance`:
+    the same shape an ANN query returns.
+    """
+    rows = (
+        table.search()
+        .where(video_index.dvdid_in_filter(dvdids))
+        .select(columns)
+        .limit(len(dvdids) * 2)
+        .to_arrow()
+    )
+    position = {}
+    for i, dvdid in enumerate(rows["dvdid"].to_pylist()):
+        position.setdefault(dvdid, i)
+    # A video deleted since the export simply drops out
+    keep = [(position[dvdid], distance) for dvdid, distance in zip(dvdids, distances) if dvdid in position]
+    rows = rows.take(pa.array([i for i, _ in keep], type=pa.int64()))
+    return rows.append_column("_distance", pa.array([d for _, d in keep], type=pa.float32()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the vector column for SEARCH_BACKEND=exact.")
+    parser.add_argument("--dtype", choices=DTYPES, default="float16", help="float16 halves the file and RAM")
+    parser.add_argument("--out", default=EXACT_DIR)
+    parser.add_argument("--reduce", choices=REDUCE_METHODS, help="Also write a reduced-dimension first-stage copy")
+    parser.add_argument("--dims", type=int, default=REDUCED_DIMS, help="Dimensions kept by --reduce")
+    args = parser.parse_args()
+
+    print("🔌 Connecting to LanceDB...")
+    table = lancedb.connect(DB_FOLDER).open_table(TABLE_NAME)
+
+    started = time.perf_counter()
+    print(f"📤 Exporting {table.count_rows()} vectors as {args.dtype}...")
+    rows = export(table, args.out, args.dtype)
+    size_mb = os.path.getsize(os.path.join(args.out, VECTORS_FILE)) / 1e6
+    print(f"✅ {rows} rows -> {args.out}/{VECTORS_FILE} ({size_mb:.0f} MB) in {time.perf_counter() - started:.1f}s")
+
+    if args.reduce:
+        started = time.perf_counter()
+        print(f"📉 Reducing to {args.dims} dimensions ({args.reduce})...")
+        dims = export_reduced(args.out, args.reduce, args.dims)
+        size_mb = os.path.getsize(os.path.join(args.out, REDUCED_FILE)) / 1e6
+        print(f"✅ {dims}-d copy -> {args.out}/{REDUCED_FILE} ({size_mb:.0f} MB) in {time.perf_counter() - started:.1f}s")
+        print("   Check the recall loss with bench_reduced.py, then set EXACT_REDUCED=1.")
+
+    print("Restart 'main.py' with SEARCH_BACKEND=exact to use it. Re-run after every reindex.")
+
+
+if __name__ == "__main__":
+    main()
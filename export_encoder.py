@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from encoder import BACKENDS, ONNX_DIR, ONNX_FILES, load_model
+
+# --- CONFIGURATION ---
+MODEL_NAME = "intfloat/multilingual-e5-large"  # Keep in sync with main.py
+QUERY_PREFIX = "query: " if "e5" in MODEL_NAME else ""
+CSV_FILE = "final_api_data.csv"
+SAMPLE_SIZE = 300  # Titles used for the agreement / latency check
+QUANT_CONFIG = "avx512_vnni"  # arm64, avx2, avx512 or avx512_vnni: match the server CPU
+MIN_AGREEMENT = 0.99  # Mean cosine vs PyTorch below this is reported as a failure
+SEED = 42
+
+
+def export(qconfig):
+    """Writes the fp32 ONNX model and its int8 variant to ONNX_DIR."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    print(f"📦 Exporting {MODEL_NAME} to ONNX...")
+    model = SentenceTransformer(MODEL_NAME, backend="onnx")
+    model.save_pretrained(ONNX_DIR)
+    print(f"   fp32 -> {ONNX_DIR}/{ONNX_FILES['onnx']}")
+
+    print(f"🗜️ Quantizing to int8 ({qconfig})...")
+    export_dynamic_quantized_onnx_model(model, qconfig, ONNX_DIR, file_suffix="qint8")
+    print(f"   int8 -> {ONNX_DIR}/{ONNX_FILES['onnx-int8']}")
+
+    for backend, file_name in ONNX_FILES.items():
+        size_mb = os.path.getsize(os.path.join(ONNX_DIR, file_name)) / 1e6
+        print(f"   {backend:<10} {size_mb:8.0f} MB")
+    print("\n✅ Export done. Run `python export_encoder.py check` before switching ENCODER_BACKEND.")
+
+
+def sample_queries(n):
+    df = pd.read_csv(CSV_FILE, usecols=["title"]).dropna()
+    titles = df["title"].astype(str).sample(min(n, len(df)), random_state=SEED)
+    # Embedded exactly the way main.py embeds a typed query
+    return [QUERY_PREFIX + " ".join(t.split()) for t in titles]
+
+
+def measure(backend, texts_file, out_file):
+    """Runs in its own process so each backend's RSS is measured in isolation."""
+    with open(texts_file, "r", encoding="utf-8") as f:
+        texts = json.load(f)
+
+    started = time.perf_counter()
+    model = load_model(MODEL_NAME, backend)
+    load_s = time.perf_counter() - started
+
+    for text in texts[:5]:  # Warm-up
+        model.encode([text], normalize_embeddings=True, show_progress_bar=False)
+
+    # One query per call, like a single /api/search
+    latencies = []
+    vectors = []
+    for text in texts:
+        started = time.perf_counter()
+        vec = model.encode([text], normalize_embeddings=True, show_progress_bar=False)
+        latencies.append((time.perf_counter() - started) * 1000)
+        vectors.append(vec[0])
+
+    np.save(out_file, np.asarray(vectors, dtype=np.float32))
+    print(
+        json.dumps(
+            {
+                "load_s": load_s,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                # ru_maxrss is in KB on Linux
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def check(backends, n):
+    texts = sample_queries(n)
+    print(f"🔍 {len(texts)} titles from {CSV_FILE}, backends: {', '.join(backends)}\n")
+
+    stats = {}
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_file = os.path.join(tmp, "texts.json")
+        with open(texts_file, "w", encoding="utf-8") as f:
+            json.dump(texts, f, ensure_ascii=False)
+
+        for backend in backends:
+            out_file = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, __file__, "measure", "--backend", backend, "--texts", texts_file, "--out", out_file],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                print(f"❌ {backend}: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+                continue
+            stats[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            vectors[backend] = np.load(out_file)
+
+    reference = vectors.get("torch")
+    print(f"{'backend':<10} {'load':>7} {'p50':>9} {'p95':>9} {'peak RSS':>10} {'cos mean':>9} {'cos min':>9}")
+    compared = 0
+    failed = False
+    for backend in backends:
+        if backend not in stats:
+            continue
+        s = stats[backend]
+        line = (
+            f"{backend:<10} {s['load_s']:6.1f}s {s['p50_ms']:7.1f}ms {s['p95_ms']:7.1f}ms "
+            f"{s['peak_rss_mb']:8.0f}MB"
+        )
+        if reference is not None and backend != "torch":
+            # Both sides are normalized, so the row-wise dot product is the cosine
+            cosine = np.sum(vectors[backend] * reference, axis=1)
+            line += f" {cosine.mean():9.4f} {cosine.min():9.4f}"
+            compared += 1
+            if cosine.mean() < MIN_AGREEMENT:
+                line += "  ❌"
+                failed = True
+        print(line)
+
+    if reference is None or not compared:
+        print("\n⚠️ Need PyTorch and at least one exported backend to check agreement.")
+    elif failed:
+        print(f"\n❌ Mean cosine below {MIN_AGREEMENT}: keep ENCODER_BACKEND=torch or re-export.")
+    else:
+        print("\n✅ Exported models agree with PyTorch.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX / int8 and compare it with PyTorch.")
+    parser.add_argument("action", choices=["export", "check", "measure"])
+    parser.add_argument("--qconfig", default=QUANT_CONFIG, help="int8 quantization target (export)")
+    parser.add_argument("--samples", type=int, default=SAMPLE_SIZE, help="Titles to compare (check)")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS, help="Backends to run (check)")
+    # Internal: one backend per process
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--texts", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.action == "export":
+        export(args.qconfig)
+    elif args.action == "check":
+        check(args.backends, args.samples)
+    else:
+        measure(args.backend, args.texts, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,102 @@
+import asyncio
 import json
 import re
 import time
 import os
+from datetime import timedelta
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import partial
 from typing import List, Optional
-from difflib import SequenceMatcher
 
 import lancedb
-import pandas as pd
-from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+import numpy as np
+import pyarrow as pa
+from fastapi import FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sentence_transformers import SentenceTransformer
+from pydantic import BaseModel, Field
 
 # --- IMPORT LOCAL MODULE ---
 import search as search_engine
+from embed_service import EmbeddingClient, probe
+from encoder import BatchEncoder, load_model
+from exact_index import ExactIndex, attach_rows
+from name_index import ActressIndex
+import metrics
+import ranking
+import serialization
+import video_index
 
 # --- CONFIG ---
 DB_FOLDER = "jav_search_index"
 TABLE_NAME = "videos"
+NEIGHBOR_TABLE = "similar"  # Written by precompute_similar.py
 MODEL_NAME = "intfloat/multilingual-e5-large"
+# "torch", "onnx" or "onnx-int8"; the ONNX ones need export_encoder.py first
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+# Shared model for several workers (embed_service.py); "" = always load the model in-process
+EMBED_SOCKET = os.environ.get("EMBED_SOCKET", "embed_service.sock")
 ACTRESS_DB_FILE = "actress_db.json"
+QUERY_PREFIX = "query: " if "e5" in MODEL_NAME else ""
+# Stored in the table but never returned to clients
+INTERNAL_COLUMNS = {
+    "vector",
+    video_index.ACTRESS_LIST_COLUMN,
+    video_index.DVDID_KEY_COLUMN,
+    video_index.FTS_TEXT_COLUMN,
+}
+MAX_TOP_K = 500  # Results per query, on every search endpoint
+MAX_BATCH_QUERIES = 5000  # Per /api/search/batch call
+STREAM_CHUNK_SIZE = 10  # Results per line of /api/search/stream
+WS_MODE = "Deep Similarity"  # Mode label for /ws/similar in /metrics
+WS_SESSION_SOURCES = 16  # Source rows (with vectors) remembered per /ws/similar session
+# Matches per /ws/similar frame unless the request says otherwise; 1 = one "match" frame each
+WS_BATCH_SIZE = int(os.environ.get("WS_BATCH_SIZE", 1))
+WS_BATCH_MS = int(os.environ.get("WS_BATCH_MS", 50))  # A partial batch is sent once this old
+MAX_WS_BATCH_SIZE = 1000
+TOP_VIDEOS_MODE = "Actress Top Videos"  # Mode label for /api/actress_top_videos
+MODEL_WAIT_TIMEOUT = 10  # Seconds a semantic query waits for a model still loading
+RETRY_AFTER_SECONDS = 15  # Sent with 503s during startup
+QUERY_CACHE_SIZE = 4096  # Max cached query embeddings
+QUERY_CACHE_TTL = 3600  # Seconds before a cached embedding is recomputed
+RESULT_CACHE_MB = 64  # Memory budget for cached response bodies
+TABLE_REFRESH_INTERVAL = 30  # Seconds between checks for a reindexed table (and a new cache generation)
+# IVF-PQ search knobs; pick them with bench_ann.py. Requests may override both.
+ANN_NPROBES = int(os.environ.get("ANN_NPROBES", 20))  # IVF partitions scanned per query (LanceDB's default)
+ANN_REFINE_FACTOR = int(os.environ.get("ANN_REFINE_FACTOR", 0)) or None  # Re-score limit x this many PQ hits exactly; None = off
+MAX_NPROBES = 1024  # Per-request caps, so one query can't ask for a full scan
+MAX_REFINE_FACTOR = 100
+VECTOR_METRIC = "cosine"  # What the IVF-PQ index is built with (and what exact_index.py computes)
+# LanceDB calls never run on the event loop. Each lane is its own thread pool, so
+# slow scans can queue behind each other but never in front of a cheap lookup.
+DB_FAST_WORKERS = 4  # Index lookups: exact ID, source row, precomputed neighbours, BM25
+# Vector queries and filter scans (actress timelines, top videos). They are CPU-bound
+# in LanceDB's own threads, so running more at once than half the cores only slows each one.
+DB_SCAN_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Queries one /api/search/batch call keeps on the lanes at once, so interactive requests
+# queue behind at most this many of its queries instead of the whole batch
+BATCH_DB_CONCURRENCY = max(1, DB_SCAN_WORKERS // 2)
+# "lancedb" (IVF-PQ) or "exact" (memory-mapped matrix; needs exact_index.py first)
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "lancedb")
+# Exact backend only: pick candidates on the reduced-dimension copy (exact_index.py --reduce)
+EXACT_REDUCED = os.environ.get("EXACT_REDUCED", "0") == "1"
 
 # --- GLOBAL RESOURCES ---
 resources = {}
 
 
 class Timer:
-    def __init__(self, name):
-        self.name = name
+    """
+    Records a stage's duration in the /metrics histogram, labelled by search mode.
+    `mode` can be set inside the block once it is known; log=True also prints it.
+    """
+
+    def __init__(self, stage, mode="", log=False):
+        self.stage = stage
+        self.mode = mode
+        self.log = log
         self.start = 0
 
     def __enter__(self):
@@ -37,23 +105,172 @@ class Timer:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         elapsed = time.perf_counter() - self.start
-        print(f"⏱️ [{self.name}] took {elapsed:.4f}s")
+        metrics.STAGE_SECONDS.observe(elapsed, stage=self.stage, mode=self.mode)
+        if self.log:
+            print(f"⏱️ [{self.stage}] took {elapsed:.4f}s")
+
+
+def record_request(endpoint, mode, started):
+    metrics.REQUESTS.inc(endpoint=endpoint, mode=mode)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, mode=mode)
+
+class EmbeddingCache:
+    """
+    Bounded LRU of query text -> normalized embedding.
+    Entries older than `ttl` seconds are treated as misses.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, vector)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, key, vector):
+        vector.setflags(write=False)  # Shared between requests
+        self._data[key] = (time.monotonic() + self.ttl, vector)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ResultCache:
+    """
+    LRU of serialized response bodies, bounded by their total size.
+    Entries belong to one generation (table version + profile DB mtimes);
+    the first lookup under a new generation drops everything from the old one.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.generation = None
+        self._data = OrderedDict()  # key -> body
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            self._data.clear()
+            self.bytes = 0
+            self.generation = generation
+
+    def get(self, generation, key):
+        self._check_generation(generation)
+        body = self._data.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, generation, key, body):
+        self._check_generation(generation)
+        if len(body) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._data[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
 
 def normalize_text(text):
     if not text:
         return ""
     return text.lower().strip()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Load resources on startup
-    print("⚡ Loading Neural Model & Database...")
-    resources["model"] = SentenceTransformer(MODEL_NAME)
 
+def normalize_query(text):
+    # Whitespace only: the model is cased, so the case is part of the query
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def load_database():
+    """Table, actress names and profiles: everything the ID and actress paths need."""
     try:
-        db = lancedb.connect(DB_FOLDER)
+        # Without a consistency interval an open table never sees a reindex
+        db = lancedb.connect(DB_FOLDER, read_consistency_interval=timedelta(seconds=TABLE_REFRESH_INTERVAL))
         resources["table"] = db.open_table(TABLE_NAME)
+        # Metadata we actually return; the 1024-d vector stays in LanceDB
+        schema_names = resources["table"].schema.names
+        resources["result_columns"] = [name for name in schema_names if name not in INTERNAL_COLUMNS]
+        # Exact actress lookups need the label-list column (see upgrade_index.py)
+        resources["has_actress_list"] = video_index.ACTRESS_LIST_COLUMN in schema_names
+        if not resources["has_actress_list"]:
+            print("⚠️ No actress_list column; actress filters fall back to LIKE scans.")
+        resources["has_dvdid_key"] = video_index.DVDID_KEY_COLUMN in schema_names
+        if not resources["has_dvdid_key"]:
+            print("⚠️ No dvdid_key column; ID queries go through the vector search.")
+        # BM25 candidates and rank fusion need the full-text index (see upgrade_index.py)
+        resources["has_fts"] = video_index.has_fts_index(resources["table"])
+        if not resources["has_fts"]:
+            print("⚠️ No full-text index; keywords are matched by scanning the ANN candidates.")
+        resources["has_vector_index"] = video_index.has_vector_index(resources["table"])
         print(f"📚 Index connected: {len(resources['table'])} videos")
+
+        resources["exact_index"] = None
+        if SEARCH_BACKEND == "exact":
+            try:
+                exact = ExactIndex(use_reduced=EXACT_REDUCED)
+                resources["exact_index"] = exact
+                print(f"🎯 Exact search: {len(exact)} vectors ({exact.meta['dtype']}, memory-mapped)")
+                if exact.reduced is not None:
+                    reduced = exact.meta["reduced"]
+                    print(f"📉 First stage on {reduced['dims']}-d {reduced['method']} copy, full-vector re-score")
+                elif EXACT_REDUCED:
+                    print("⚠️ EXACT_REDUCED is set but no reduced copy was exported; searching full vectors.")
+                if len(exact) != len(resources["table"]):
+                    print("⚠️ Exact index row count differs from the table; re-run exact_index.py.")
+            except FileNotFoundError:
+                print("⚠️ No exact index export; using the LanceDB vector index.")
+
+        if NEIGHBOR_TABLE in db.table_names():
+            resources["neighbors"] = db.open_table(NEIGHBOR_TABLE)
+            print(f"🧭 Precomputed neighbours: {len(resources['neighbors'])} videos")
     except Exception as e:
         print(f"❌ Database error: {e}")
         resources["table"] = None
@@ -63,28 +280,164 @@ async def lifespan(app: FastAPI):
         with open(ACTRESS_DB_FILE, "r", encoding="utf-8") as f:
             actress_list = json.load(f)
             actress_list.sort(key=len, reverse=True)
-            resources["actress_db"] = actress_list
-            print(f"💃 Actress DB loaded: {len(actress_list)} names")
     except FileNotFoundError:
-        resources["actress_db"] = []
+        actress_list = []
         print("⚠️ Actress DB not found.")
 
+    resources["actress_index"] = ActressIndex(actress_list)
+    print(f"💃 Actress DB loaded: {len(actress_list)} names")
+
+    # Build the profile index now so the first actress query doesn't pay for it
+    profile_index = search_engine.get_index()
+    print(f"🪪 Profile index loaded: {len(profile_index.matches)} names")
+
+
+def load_encoder():
+    """
+    The neural model, or the embedding service when one is listening on
+    EMBED_SOCKET. Only semantic queries wait for it.
+    """
+    if EMBED_SOCKET:
+        info = probe(EMBED_SOCKET)
+        if info is not None and info["model"] == MODEL_NAME:
+            # Encodes go to the service, which batches them across all workers
+            resources["encoder"] = EmbeddingClient(EMBED_SOCKET)
+            print(f"🧠 Embedding service at {EMBED_SOCKET} ({info['backend']}, pid {info['pid']})")
+            print("✅ Model ready: semantic search enabled")
+            return
+        if info is not None:
+            print(f"⚠️ Embedding service at {EMBED_SOCKET} serves {info['model']}; loading {MODEL_NAME} here.")
+
+    try:
+        model = load_model(MODEL_NAME, ENCODER_BACKEND)
+        print(f"🧠 Encoder backend: {ENCODER_BACKEND}")
+    except FileNotFoundError as e:
+        print(f"⚠️ {e}; falling back to the PyTorch encoder.")
+        model = load_model(MODEL_NAME, "torch")
+    # Encodes run on their own thread, micro-batched across concurrent requests
+    resources["encoder"] = BatchEncoder(model)
+    print("✅ Model ready: semantic search enabled")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load resources in the background; the server accepts connections right away
+    print("⚡ Loading Neural Model & Database...")
+    resources["query_cache"] = EmbeddingCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+    resources["result_cache"] = ResultCache(RESULT_CACHE_MB * 1024 * 1024)
+    resources["db_lanes"] = {
+        "fast": ThreadPoolExecutor(DB_FAST_WORKERS, thread_name_prefix="db-fast"),
+        "scan": ThreadPoolExecutor(DB_SCAN_WORKERS, thread_name_prefix="db-scan"),
+    }
+    resources["db_task"] = asyncio.create_task(asyncio.to_thread(load_database))
+    resources["model_task"] = asyncio.create_task(asyncio.to_thread(load_encoder))
+
     yield
+    for task in (resources["db_task"], resources["model_task"]):
+        task.cancel()
+    if "encoder" in resources:
+        resources["encoder"].close()
+    for lane in resources["db_lanes"].values():
+        lane.shutdown(wait=False, cancel_futures=True)
     resources.clear()
 
 app = FastAPI(lifespan=lifespan)
 
 
+# --- READINESS ---
+def component_state(task_name):
+    task = resources.get(task_name)
+    if task is None or not task.done():
+        return "loading"
+    if task.cancelled() or task.exception() is not None:
+        return "failed"
+    if task_name == "db_task" and resources.get("table") is None:
+        return "failed"
+    return "ready"
+
+
+def require_table():
+    """The videos table once loading has finished, else a 503 (with Retry-After while loading)."""
+    state = component_state("db_task")
+    if state == "loading":
+        raise HTTPException(
+            status_code=503, detail="Database loading", headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    if state == "failed":
+        raise HTTPException(status_code=503, detail="Server initializing or DB missing")
+    return resources["table"]
+
+
+async def run_db(lane, fn, *args, **kwargs):
+    """Runs a blocking LanceDB call on a "fast" or "scan" lane, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(resources["db_lanes"][lane], partial(fn, *args, **kwargs))
+
+
+async def wait_for_encoder():
+    """Semantic queries wait up to MODEL_WAIT_TIMEOUT for the model, then get a 503."""
+    try:
+        await asyncio.wait_for(asyncio.shield(resources["model_task"]), MODEL_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Model loading, semantic search not ready yet",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {e}")
+
+
+def cache_generation(table):
+    """
+    Responses are deterministic per table version and profile DB, so that is the
+    cache's version. table.version is a LanceDB call: read it with run_db("fast", ...).
+    """
+    return (table.version, search_engine.get_index().mtimes)
+
+
 # --- HELPER LOGIC ---
+async def encode_queries(texts, mode="batch"):
+    # The cache key is also exactly what we embed. Re-submits that only
+    # change top_k / threshold (or the spacing) hit the cache.
+    keys = [QUERY_PREFIX + normalize_query(text) for text in texts]
+    cache = resources["query_cache"]
+
+    # One lookup per distinct text; a repeat isn't a second hit or miss
+    vectors = {key: cache.get(key) for key in dict.fromkeys(keys)}
+    missing = [key for key, vec in vectors.items() if vec is None]
+    metrics.EMBEDDING_CACHE.inc(len(vectors) - len(missing), result="hit")
+    metrics.EMBEDDING_CACHE.inc(len(missing), result="miss")
+    if missing:
+        await wait_for_encoder()
+        # All misses go to the encoder together (in MAX_BATCH_SIZE chunks when there are many)
+        with Timer("encode", mode):
+            try:
+                encoded = await resources["encoder"].encode_many(missing)
+            except ConnectionError as e:
+                # The embedding service went away; restarting it is enough to recover
+                raise HTTPException(
+                    status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+                )
+        for key, vec in zip(missing, encoded):
+            cache.put(key, vec)
+            vectors[key] = vec
+
+    return [vectors[key] for key in keys]
+
+
+async def encode_query(text, mode=""):
+    return (await encode_queries([text], mode))[0]
+
+
 def is_dvd_id(query):
     q = query.strip()
     return re.match(r"^[a-zA-Z]+[- ]?\d+$", q) is not None
 
 
-def extract_entities(user_query, actress_db):
+def extract_entities(user_query, actress_index):
     cleaned_query = user_query.lower()
     tokens = user_query.strip().split()
-    found_actresses = []
 
     # --- PHASE 1: Fuzzy Priority for 2-Word Inputs ---
     # We prioritize matching 2-word inputs against Multi-Word actresses (e.g. "Hikaru Nag" -> "Hikaru Nagi")
@@ -92,38 +445,10 @@ def extract_entities(user_query, actress_db):
     if len(tokens) == 2:
         input_name = user_query.lower()
         reversed_name = f"{tokens[1]} {tokens[0]}".lower()
-        
-        best_match = None
-        best_score = 0.0
-        
-        # Optimization: Filter roughly by length
-        input_len = len(input_name)
-        min_len = int(input_len * 0.6)
-        max_len = int(input_len * 1.4)
-
-        for name in actress_db:
-            # 1. Multi-Word Priority: Skip single names in this phase
-            if " " not in name:
-                continue
 
-            # 2. Length Filter
-            if not (min_len <= len(name) <= max_len):
-                continue
+        # Checks both token orders against multi-word names at an 80% ratio cutoff
+        best_match = actress_index.fuzzy.best_match(input_name, reversed_name)
 
-            n_lower = name.lower()
-            
-            # Check original order
-            score_fwd = SequenceMatcher(None, input_name, n_lower).ratio()
-            # Check reverse order
-            score_rev = SequenceMatcher(None, reversed_name, n_lower).ratio()
-            
-            current_max = max(score_fwd, score_rev)
-            
-            # Threshold 80%
-            if current_max >= 0.80 and current_max > best_score:
-                best_score = current_max
-                best_match = name
-        
         # If we found a High Confidence 2-Word Match, return immediately
         if best_match:
             return "", [best_match]
@@ -131,13 +456,8 @@ def extract_entities(user_query, actress_db):
     # --- PHASE 2: Standard Exact Search ---
     # If no fuzzy match was found (or query wasn't 2 words), fall back to checking all names.
     # This handles single names, exact matches, and multi-entity queries.
-    for name in actress_db:
-        if name.lower() in cleaned_query:
-            found_actresses.append(name)
-            # Remove the name from query to see what's left
-            cleaned_query = re.sub(
-                re.escape(name.lower()), "", cleaned_query, flags=re.IGNORECASE
-            )
+    # Longest names win; each hit is removed from the query before the next lookup.
+    cleaned_query, found_actresses = actress_index.extract_exact(cleaned_query)
 
     semantic_part = cleaned_query.strip()
     semantic_part = re.sub(r'\s+', ' ', semantic_part).strip()
@@ -145,345 +465,870 @@ def extract_entities(user_query, actress_db):
     return semantic_part, found_actresses
 
 
-def calculate_hybrid_score(row, query_tokens, is_pure_id_search, detected_cast):
-    sem_score = 1 - row.get("_distance", 1.0)
-    boost = 0.0
-
-    # 1. ID Boost
-    if is_pure_id_search:
-        clean_query = query_tokens[0].replace(" ", "-") if query_tokens else ""
-        if clean_query in str(row.get("dvdid", "")).lower().replace(" ", "-"):
-            boost += 2.0
+def find_by_dvdid(table, query, top_k):
+    """
+    Exact-ID fast path: lookups on the normalized dvdid key (BTREE index).
+    The exact ID comes first, then longer IDs sharing the prefix, shortest first.
+    """
+    key = video_index.dvdid_key(query)
+    if not key:
+        return []
 
-    # 2. Actress Boost
-    if detected_cast:
-        row_cast = str(row.get("actress_names", "")).lower()
-        for cast_name in detected_cast:
-            if cast_name.lower() in row_cast:
-                boost += 1.5
+    with Timer("lancedb_query", "Exact ID"):
+        # Every matching key, but only the key column: a short prefix like "IPX-1"
+        # can match thousands of rows, and the closest ones may be stored last
+        prefix_keys = (
+            table.search()
+            .where(video_index.dvdid_prefix_filter(key))
+            .select([video_index.DVDID_KEY_COLUMN])
+            .limit(None)
+            .to_arrow()[video_index.DVDID_KEY_COLUMN]
+            .to_pylist()
+        )
+        if not prefix_keys:
+            return []
+
+        # Closest keys until there are top_k rows (several IDs can share a key)
+        counts = Counter(prefix_keys)
+        wanted, row_count = [], 0
+        for row_key in sorted(counts, key=lambda k: (len(k), k)):
+            if row_count >= top_k:
                 break
+            wanted.append(row_key)
+            row_count += counts[row_key]
 
-    # 3. Keyword Boost
-    text_blob = f"{row.get('title', '')} {row.get('jptitle', '')} {row.get('dvdid', '')}".lower()
-    matches = sum(1 for token in query_tokens if token in text_blob)
-    if matches > 0 and len(query_tokens) > 0:
-        boost += (matches / len(query_tokens)) * 0.15
+        results = (
+            table.search()
+            .where(video_index.dvdid_in_filter(wanted, column=video_index.DVDID_KEY_COLUMN))
+            .select(resources["result_columns"] + [video_index.DVDID_KEY_COLUMN])
+            .limit(row_count)
+            .to_arrow()
+        )
 
-    return sem_score + boost, sem_score
+    row_keys = results[video_index.DVDID_KEY_COLUMN].to_pylist()
+    order = sorted(range(len(row_keys)), key=lambda i: (len(row_keys[i]), row_keys[i]))[:top_k]
+    rows = results.drop_columns([video_index.DVDID_KEY_COLUMN]).take(order).to_pylist()
 
+    final_results = []
+    for row, i in zip(rows, order):
+        # 1.0 for the exact ID, less the more of the ID is left untyped
+        match_score = len(key) / len(row_keys[i])
+        final_results.append(
+            {"data": row, "score": ranking.ID_BOOST + match_score, "sem_score": match_score}
+        )
+    return final_results
+
+
+def precomputed_neighbors(table, dvdid, top_k, threshold):
+    """
+    "More like this" served from the precompute_similar.py sidecar.
+    Returns None when there is no entry or the request asks for more than was
+    precomputed (top_k above its k, or threshold below its min_score).
+    """
+    sidecar = resources.get("neighbors")
+    if sidecar is None:
+        return None
+
+    entry = (
+        sidecar.search()
+        .where(f"dvdid = {video_index.sql_quote(dvdid)}")
+        .select(["neighbors", "scores", "k", "min_score"])
+        .limit(1)
+        .to_arrow()
+        .to_pylist()
+    )
+    if not entry:
+        return None
+    entry = entry[0]
+    if top_k > entry["k"] or threshold < entry["min_score"]:
+        return None
+
+    # Stored best first, so the cut-offs are a prefix
+    scores = {}
+    for neighbor, score in zip(entry["neighbors"], entry["scores"]):
+        if score < threshold or len(scores) >= top_k:
+            break
+        scores[neighbor] = score
+    if not scores:
+        # Answered, with nothing to send
+        return pa.table({"_distance": pa.array([], type=pa.float32())})
+
+    # Same shape as a live neighbour query, already best first
+    return attach_rows(table, list(scores), [1 - score for score in scores.values()], resources["result_columns"])
+
+
+# --- SEARCH STAGES ---
+# /api/search and /api/search/batch run the same stages; the batch endpoint
+# just runs each stage for all its queries at once.
+
+
+def plan_query(q, actress_index, nprobes=None, refine_factor=None):
+    """
+    Detects IDs and cast in the query and picks the search mode.
+    nprobes / refine_factor override the ANN defaults for this query.
+    """
+    with Timer("entity_extraction") as timer:
+        pure_id_detected = is_dvd_id(q)
+        semantic_query, detected_cast = extract_entities(q, actress_index)
+
+        # Determine Search Mode
+        search_mode = "Semantic"
+        is_pure_actress = False
+
+        if pure_id_detected:
+            search_mode = "Exact ID"
+        elif detected_cast:
+            if not semantic_query:
+                is_pure_actress = True
+                search_mode = "Actress Timeline"
+            else:
+                search_mode = "Actress + Semantic"
+        timer.mode = search_mode
 
-# --- API ENDPOINTS ---
+    return {
+        "q": q,
+        "pure_id": pure_id_detected,
+        "detected_cast": detected_cast,
+        "mode": search_mode,
+        "is_pure_actress": is_pure_actress,
+        "nprobes": nprobes,
+        "refine_factor": refine_factor,
+        "failed": False,  # Set when a query fails and the answer is partial
+    }
 
 
-@app.get("/api/search")
-async def search(q: str, top_k: int = 20, threshold: float = 0.65):
-    table = resources.get("table")
-    model = resources.get("model")
-    actress_db = resources.get("actress_db")
+def build_bio(profile, actress_tier):
+    bio = {
+        "type": "bio",
+        "tier": actress_tier, 
+        "name": profile.get("name"),
+        "jpName": profile.get("jpName"),
+        "avatar": profile.get("avatar"),
+        "birthday": profile.get("birthday"),
+        "blood_type": profile.get("blood_type"),
+        "height": profile.get("height"),
+        "bust": profile.get("bust"),
+        "waist": profile.get("waist"),
+        "hip": profile.get("hip"),
+        "cup": profile.get("cup"),
+        "twitter": profile.get("twitter"),
+        
+        # --- Tier 2.5 Expanded Fields ---
+        "debut": profile.get("debut"),
+        "birthplace": profile.get("birthplace"),
+        "sign": profile.get("sign"),
+        "shoe_size": profile.get("shoe_size"),
+        "hair_length": profile.get("hair_length"),
+        "hair_color": profile.get("hair_color"),
+
+        # --- Tier 3 Extended Info ---
+        "alsoKnownAs": profile.get("alsoKnownAs"),
+        "yearsActive": profile.get("yearsActive"),
+        "ethnicity": profile.get("ethnicity"),
+        "nationality": profile.get("nationality"),
+        "boobs": profile.get("boobs"),
+        "type": profile.get("type"),
+        "eyeColor": profile.get("eyeColor"),
+        "hair": profile.get("hair"),
+        "underarmHair": profile.get("underarmHair"),
+        "pubicHair": profile.get("pubicHair"),
+        
+        "wiki_desc": ""
+    }
+    if "castWiki" in profile and isinstance(profile["castWiki"], dict):
+        desc = profile["castWiki"].get("description", "")
+        if desc:
+            bio["wiki_desc"] = desc
 
-    if not table or not model:
-        raise HTTPException(status_code=503, detail="Server initializing or DB missing")
+    return bio
 
-    # 1. Detect Logic
-    pure_id_detected = is_dvd_id(q)
-    semantic_query, detected_cast = extract_entities(q, actress_db)
 
-    # Determine Search Mode
-    search_mode = "Semantic"
-    is_pure_actress = False
-    
-    if pure_id_detected:
-        search_mode = "Exact ID"
-    elif detected_cast:
-        if not semantic_query:
-            is_pure_actress = True
-            search_mode = "Actress Timeline"
-        else:
-            search_mode = "Actress + Semantic"
+def actress_timeline(table, actress, top_k):
+    """Latest videos featuring `actress` (label-list index lookup)."""
+    with Timer("lancedb_query", "Actress Timeline (Latest)"):
+        matched = (
+            table.search()
+            .where(video_index.actress_filter(actress, resources["has_actress_list"]))
+            .select(resources["result_columns"])
+            .limit(500)
+            .to_arrow()
+        )
 
-    # --- SPECIAL PATH: PURE ACTRESS SEARCH (TIER 1+) ---
-    if is_pure_actress and len(detected_cast) > 0:
-        primary_actress = detected_cast[0]
-        
-        # A. Fetch Bio & Check Tier
-        profile = search_engine.find_profile(primary_actress)
-        bio_result = None
+    return [{"data": row, "score": 10.0, "sem_score": 1.0} for row in serialization.latest_first(matched, top_k)]
+
+
+async def timeline_results(table, plan, top_k):
+    """
+    The actress timeline, or [] if its query fails. A failure sets
+    plan["failed"], so the bio-only answer is sent but never cached.
+    """
+    try:
+        return await run_db("scan", actress_timeline, table, plan["detected_cast"][0], top_k)
+    except Exception:
+        metrics.QUERY_ERRORS.inc(mode=plan["mode"])
+        plan["failed"] = True
+        return []
+
+
+def actress_bio(plan):
+    """
+    Bio entry for a pure actress query, or None when the query isn't one or the
+    actress is Tier 0. Settles plan["mode"] either way.
+    """
+    if not (plan["is_pure_actress"] and len(plan["detected_cast"]) > 0):
+        return None
+
+    # A. Fetch Bio & Check Tier
+    with Timer("profile_lookup") as timer:
+        profile = search_engine.find_profile(plan["detected_cast"][0])
         actress_tier = profile.get("tier", 0) if profile else 0
 
         # ONLY proceed with Actress Mode if Tier >= 1
-        if actress_tier >= 1:
-            bio_result = {
-                "type": "bio",
-                "tier": actress_tier, 
-                "name": profile.get("name"),
-                "jpName": profile.get("jpName"),
-                "avatar": profile.get("avatar"),
-                "birthday": profile.get("birthday"),
-                "blood_type": profile.get("blood_type"),
-                "height": profile.get("height"),
-                "bust": profile.get("bust"),
-                "waist": profile.get("waist"),
-                "hip": profile.get("hip"),
-                "cup": profile.get("cup"),
-                "twitter": profile.get("twitter"),
-                
-                # --- Tier 2.5 Expanded Fields ---
-                "debut": profile.get("debut"),
-                "birthplace": profile.get("birthplace"),
-                "sign": profile.get("sign"),
-                "shoe_size": profile.get("shoe_size"),
-                "hair_length": profile.get("hair_length"),
-                "hair_color": profile.get("hair_color"),
-
-                # --- Tier 3 Extended Info ---
-                "alsoKnownAs": profile.get("alsoKnownAs"),
-                "yearsActive": profile.get("yearsActive"),
-                "ethnicity": profile.get("ethnicity"),
-                "nationality": profile.get("nationality"),
-                "boobs": profile.get("boobs"),
-                "type": profile.get("type"),
-                "eyeColor": profile.get("eyeColor"),
-                "hair": profile.get("hair"),
-                "underarmHair": profile.get("underarmHair"),
-                "pubicHair": profile.get("pubicHair"),
-                
-                "wiki_desc": ""
+        # Fallback for Tier 0 (No avatar/info) -> Normal Search
+        plan["mode"] = "Actress Timeline (Latest)" if actress_tier >= 1 else "Semantic (Actress Name)"
+        timer.mode = plan["mode"]
+
+    if actress_tier < 1:
+        return None
+    return {"data": build_bio(profile, actress_tier), "score": 999.0, "sem_score": 1.0, "is_bio": True}
+
+
+async def lookup_search(table, plan, top_k):
+    """
+    The paths answered by index lookups alone: Exact ID and Actress Timeline.
+    Returns None when the query needs the vector search.
+    """
+    # --- FAST PATH: EXACT ID (index lookup, no encoding) ---
+    if plan["pure_id"] and resources["has_dvdid_key"]:
+        id_results = await run_db("fast", find_by_dvdid, table, plan["q"], top_k)
+        if id_results:
+            return {
+                "mode": plan["mode"],
+                "detected_cast": plan["detected_cast"],
+                "results": id_results,
             }
-            if "castWiki" in profile and isinstance(profile["castWiki"], dict):
-                desc = profile["castWiki"].get("description", "")
-                if desc:
-                    bio_result["wiki_desc"] = desc
-
-            # B. Direct Database Filter
-            safe_name = primary_actress.replace("'", "''")
-            
-            try:
-                matched_df = (
-                    table.search()
-                    .where(f"actress_names LIKE '%{safe_name}%'")
-                    .limit(500)
-                    .to_pandas()
-                )
-            except Exception as e:
-                print(f"Filter Error: {e}")
-                matched_df = pd.DataFrame()
-
-            final_results = []
-
-            if not matched_df.empty:
-                if "releasedate" in matched_df.columns:
-                    matched_df["releasedate"] = pd.to_datetime(matched_df["releasedate"], errors='coerce')
-                    matched_df = matched_df.sort_values(by='releasedate', ascending=False)
-                
-                matched_df = matched_df.head(top_k)
-
-                for _, row in matched_df.iterrows():
-                    row_dict = row.replace({pd.NA: None}).to_dict()
-                    if "vector" in row_dict:
-                        del row_dict["vector"]
-                    if row_dict.get("releasedate"):
-                        row_dict["releasedate"] = str(row_dict["releasedate"]).split(" ")[0]
-
-                    final_results.append(
-                        {"data": row_dict, "score": 10.0, "sem_score": 1.0}
-                    )
+        # Unknown ID: fall through to vector search like any other text
 
-            if bio_result:
-                 final_results.insert(0, {"data": bio_result, "score": 999.0, "sem_score": 1.0, "is_bio": True})
+    # --- SPECIAL PATH: PURE ACTRESS SEARCH (TIER 1+) ---
+    bio = actress_bio(plan)
+    if bio is not None:
+        # B. Direct Database Filter
+        final_results = await timeline_results(table, plan, top_k)
+        final_results.insert(0, bio)
+
+        return {
+            "mode": plan["mode"],
+            "detected_cast": plan["detected_cast"],
+            "results": final_results,
+        }
 
-            return {
-                "mode": "Actress Timeline (Latest)",
-                "detected_cast": detected_cast,
-                "results": final_results,
-            }
-        else:
-            # Fallback for Tier 0 (No avatar/info) -> Normal Search
-            search_mode = "Semantic (Actress Name)"
-            # We don't return here, we let it fall through to vector search below
+    return None
 
-    # --- NORMAL PATH: VECTOR SEARCH ---
-    
-    # 3. Encode
-    search_text = q 
-    prefix = "query: " if "e5" in MODEL_NAME else ""
-    query_vec = model.encode(prefix + search_text, normalize_embeddings=True)
 
-    # 4. DB Query
-    results_df = table.search(query_vec).limit(top_k * 3).to_pandas()
+def ann_query(table, query_vec, nprobes=None, refine_factor=None):
+    """Vector query with the IVF-PQ knobs applied; None means the configured default."""
+    query = table.search(query_vec).nprobes(nprobes or ANN_NPROBES)
+    refine_factor = refine_factor or ANN_REFINE_FACTOR
+    if refine_factor:
+        query = query.refine_factor(refine_factor)
+    return query
 
-    if results_df.empty:
-        return {"results": [], "mode": search_mode}
 
-    # 5. Re-Rank / Score
-    processed_results = []
-    query_tokens = search_text.lower().split()
+def exact_candidates(table, query_vec, limit, mode="", exclude=None):
+    """Nearest rows from the memory-mapped matrix, shaped like an ANN result."""
+    with Timer("exact_search", mode):
+        dvdids, distances = resources["exact_index"].search(query_vec, limit + (1 if exclude else 0))
+    ranked = [(dvdid, distance) for dvdid, distance in zip(dvdids, distances) if dvdid != exclude][:limit]
+    with Timer("lancedb_query", mode):
+        return attach_rows(table, [d for d, _ in ranked], [d for _, d in ranked], resources["result_columns"])
 
-    for _, row in results_df.iterrows():
-        final_score, vector_score = calculate_hybrid_score(
-            row, query_tokens, pure_id_detected, detected_cast
-        )
 
-        pass_threshold = False
-        if pure_id_detected or detected_cast:
-            if final_score > 1.0 or vector_score > (threshold - 0.15):
-                pass_threshold = True
-        elif vector_score > threshold:
-            pass_threshold = True
+def vector_candidates(table, query_vec, top_k, mode="", nprobes=None, refine_factor=None):
+    """ANN query; 3x top_k candidates for the re-rank to choose from."""
+    if resources["exact_index"] is not None:
+        return exact_candidates(table, query_vec, top_k * 3, mode)
 
-        if pass_threshold:
-            row_dict = row.replace({pd.NA: None}).to_dict()
-            if "vector" in row_dict:
-                del row_dict["vector"]
+    with Timer("lancedb_query", mode):
+        return (
+            ann_query(table, query_vec, nprobes, refine_factor)
+            .select(resources["result_columns"])
+            .limit(top_k * 3)
+            .to_arrow()
+        )
 
-            processed_results.append(
-                {"data": row_dict, "score": final_score, "sem_score": vector_score}
-            )
 
-    processed_results.sort(key=lambda x: x["score"], reverse=True)
-    final_results = processed_results[:top_k]
+def fts_candidates(table, q, limit, mode=""):
+    """BM25 query on the n-gram index; dvdids best first."""
+    with Timer("fts_query", mode):
+        results = (
+            table.search(q, query_type="fts", fts_columns=video_index.FTS_TEXT_COLUMN)
+            .select(["dvdid"])
+            .limit(limit)
+            .to_arrow()
+        )
+    return list(dict.fromkeys(results["dvdid"].to_pylist()))
+
+
+def exact_distances(table, query_vec, dvdids, mode=""):
+    """The given videos with the same _distance the ANN query would report."""
+    query = table.search(query_vec).where(video_index.dvdid_in_filter(dvdids), prefilter=True).bypass_vector_index()
+    # A flat scan defaults to L2; the index and the exact backend score by VECTOR_METRIC
+    if resources["has_vector_index"] or resources["exact_index"] is not None:
+        query = query.distance_type(VECTOR_METRIC)
+    with Timer("lancedb_query", mode):
+        return query.select(resources["result_columns"]).limit(len(dvdids) * 2).to_arrow()
+
+
+async def hybrid_candidates(table, plan, query_vec, top_k):
+    """
+    ANN and BM25 queries side by side. BM25 hits the ANN query missed are
+    added with their exact distance, so every candidate gets a semantic score.
+    Returns (candidates, (ann_ranks, fts_ranks)), or (candidates, None)
+    without a full-text index.
+    """
+    mode = plan["mode"]
+    ann_args = (table, query_vec, top_k, mode, plan["nprobes"], plan["refine_factor"])
+    if not resources["has_fts"] or not plan["q"].strip():
+        return await run_db("scan", vector_candidates, *ann_args), None
+
+    ann, fts_ids = await asyncio.gather(
+        run_db("scan", vector_candidates, *ann_args),
+        run_db("fast", fts_candidates, table, plan["q"], top_k, mode),
+    )
+
+    ann_ids = ann["dvdid"].to_pylist()
+    seen = set(ann_ids)
+    missing = [dvdid for dvdid in fts_ids if dvdid not in seen]
+    if missing:
+        extra = await run_db("fast", exact_distances, table, query_vec, missing, mode)
+        ann = pa.concat_tables([ann, extra.select(ann.column_names)])
+
+    fts_rank = {dvdid: i + 1 for i, dvdid in enumerate(fts_ids)}
+    ann_ranks = np.zeros(ann.num_rows)
+    ann_ranks[: len(ann_ids)] = np.arange(1, len(ann_ids) + 1)
+    fts_ranks = np.array([fts_rank.get(dvdid, 0) for dvdid in ann["dvdid"].to_pylist()])
+    return ann, (ann_ranks, fts_ranks)
+
+
+async def vector_search(table, plan, query_vec, top_k, threshold):
+    """ANN (+ BM25) query plus hybrid re-rank. Shared by the single and batch endpoints."""
+    results, ranks = await hybrid_candidates(table, plan, query_vec, top_k)
+
+    if results.num_rows == 0:
+        return {"results": [], "mode": plan["mode"]}
+
+    # Re-Rank / Score (column-wise; only the winning rows become dicts)
+    query_tokens = plan["q"].lower().split()
+    with Timer("rerank", plan["mode"]):
+        final_results = ranking.rerank(
+            results, query_tokens, plan["pure_id"], plan["detected_cast"], threshold, top_k, ranks
+        )
 
     return {
-        "mode": search_mode,
-        "detected_cast": detected_cast,
+        "mode": plan["mode"],
+        "detected_cast": plan["detected_cast"],
         "results": final_results,
     }
 
-@app.websocket("/ws/similar")
-async def websocket_similar(websocket: WebSocket):
-    await websocket.accept()
-    
+
+def serialize(payload, mode):
+    """The JSON response for a payload, encoded here so it shows up in /metrics."""
+    with Timer("serialization", mode):
+        return serialization.response(payload)
+
+
+def ndjson(frame, mode=""):
+    with Timer("serialization", mode):
+        return serialization.ndjson(frame)
+
+
+async def stream_search(table, plan, top_k, threshold, cache_key=None):
+    """
+    /api/search as NDJSON lines: meta, then the bio card (actress path), then
+    results in STREAM_CHUNK_SIZE pieces as they are ready, then done.
+    A stream that reaches done is stored under cache_key (generation, key),
+    unless a query failed along the way.
+    """
+    started = time.perf_counter()
+    count = 0
+    lines = []
+    try:
+        # Profiles are in memory, so the final mode is known before any DB work
+        bio = actress_bio(plan)
+        lines.append(ndjson({"type": "meta", "mode": plan["mode"], "detected_cast": plan["detected_cast"]}, plan["mode"]))
+        yield lines[-1]
+
+        results = []
+        if plan["pure_id"] and resources["has_dvdid_key"]:
+            results = await run_db("fast", find_by_dvdid, table, plan["q"], top_k)
+        elif bio is not None:
+            # The card is on screen while the timeline query runs
+            lines.append(ndjson({"type": "bio", "data": bio}, plan["mode"]))
+            yield lines[-1]
+            results = await timeline_results(table, plan, top_k)
+
+        if results or bio is not None:
+            for start in range(0, len(results), STREAM_CHUNK_SIZE):
+                chunk = results[start : start + STREAM_CHUNK_SIZE]
+                count += len(chunk)
+                lines.append(ndjson({"type": "results", "results": chunk}, plan["mode"]))
+                yield lines[-1]
+        else:
+            # --- NORMAL PATH: VECTOR SEARCH ---
+            query_vec = await encode_query(plan["q"], plan["mode"])
+            candidates, ranks = await hybrid_candidates(table, plan, query_vec, top_k)
+
+            if candidates.num_rows > 0:
+                with Timer("rerank", plan["mode"]):
+                    winners, final_scores, sem_scores = ranking.rank(
+                        candidates, plan["q"].lower().split(), plan["pure_id"], plan["detected_cast"], threshold, top_k, ranks
+                    )
+                # Rows only become dicts one chunk at a time, so the best ones go out first
+                for start in range(0, len(winners), STREAM_CHUNK_SIZE):
+                    chunk = winners[start : start + STREAM_CHUNK_SIZE]
+                    count += len(chunk)
+                    with Timer("serialization", plan["mode"]):
+                        records = ranking.scored_records(candidates, chunk, final_scores, sem_scores)
+                    lines.append(ndjson({"type": "results", "results": records}, plan["mode"]))
+                    yield lines[-1]
+
+        lines.append(ndjson({"type": "done", "mode": plan["mode"], "count": count}, plan["mode"]))
+        # Stored before the last send, which a departing client can cut short
+        if cache_key is not None and not plan["failed"]:
+            resources["result_cache"].put(*cache_key, b"".join(lines))
+        record_request("stream", plan["mode"], started)
+        yield lines[-1]
+
+    except HTTPException as e:
+        # Headers are already sent, so e.g. "model still loading" travels as a frame
+        yield ndjson({"type": "error", "message": e.detail, "retry_after": (e.headers or {}).get("Retry-After")}, plan["mode"])
+    except Exception as e:
+        print(f"❌ Stream Error: {e}")
+        yield ndjson({"type": "error", "message": str(e)}, plan["mode"])
+
+
+# --- API ENDPOINTS ---
+
+
+@app.get("/api/search")
+async def search(
+    q: str,
+    top_k: int = Query(20, ge=1, le=MAX_TOP_K),
+    threshold: float = Query(0.65, ge=0, le=1),
+    nprobes: Optional[int] = Query(None, ge=1, le=MAX_NPROBES),
+    refine_factor: Optional[int] = Query(None, ge=1, le=MAX_REFINE_FACTOR),
+):
+    started = time.perf_counter()
+    # ID and actress paths only need the table; the model is awaited on first encode
+    table = require_table()
+    actress_index = resources["actress_index"]
+
+    # Same request, same table version and profiles -> same bytes
+    generation = await run_db("fast", cache_generation, table)
+    key = ("search", q, top_k, threshold, nprobes, refine_factor)
+    cached = resources["result_cache"].get(generation, key)
+    if cached is not None:
+        record_request("search", "cached", started)
+        return Response(cached, media_type="application/json")
+
+    # 1. Detect Logic
+    plan = plan_query(q, actress_index, nprobes, refine_factor)
+
+    # 2. Index-only paths (Exact ID, Actress Timeline)
+    response = await lookup_search(table, plan, top_k)
+    if response is None:
+        # --- NORMAL PATH: VECTOR SEARCH ---
+        # 3. Encode
+        query_vec = await encode_query(q, plan["mode"])
+
+        # 4. DB Query + Re-Rank
+        response = await vector_search(table, plan, query_vec, top_k, threshold)
+
+    body = serialize(response, plan["mode"])
+    if not plan["failed"]:
+        resources["result_cache"].put(generation, key, body.body)
+    record_request("search", plan["mode"], started)
+    return body
+
+
+@app.get("/api/search/stream")
+async def search_stream(
+    q: str,
+    top_k: int = Query(20, ge=1, le=MAX_TOP_K),
+    threshold: float = Query(0.65, ge=0, le=1),
+    nprobes: Optional[int] = Query(None, ge=1, le=MAX_NPROBES),
+    refine_factor: Optional[int] = Query(None, ge=1, le=MAX_REFINE_FACTOR),
+):
+    """Same search as /api/search, streamed as NDJSON so the page can paint early."""
+    started = time.perf_counter()
+    table = require_table()
+    actress_index = resources["actress_index"]
+
+    # A repeat is served whole: every line is already known
+    generation = await run_db("fast", cache_generation, table)
+    key = ("stream", q, top_k, threshold, nprobes, refine_factor)
+    cached = resources["result_cache"].get(generation, key)
+    if cached is not None:
+        record_request("stream", "cached", started)
+        return Response(cached, media_type="application/x-ndjson")
+
+    plan = plan_query(q, actress_index, nprobes, refine_factor)
+    return StreamingResponse(
+        stream_search(table, plan, top_k, threshold, cache_key=(generation, key)),
+        media_type="application/x-ndjson",
+    )
+
+
+class BatchQuery(BaseModel):
+    q: str
+    top_k: int = Field(20, ge=1, le=MAX_TOP_K)
+    threshold: float = Field(0.65, ge=0, le=1)
+    nprobes: Optional[int] = Field(None, ge=1, le=MAX_NPROBES)
+    refine_factor: Optional[int] = Field(None, ge=1, le=MAX_REFINE_FACTOR)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+
+async def bounded(slots, fn, *args):
+    """await fn(*args) once one of the semaphore's slots is free."""
+    async with slots:
+        return await fn(*args)
+
+
+@app.post("/api/search/batch")
+async def search_batch(request: BatchSearchRequest):
+    """
+    Many searches in one call, answered in order.
+    Every query goes through the same stages as /api/search, but the
+    embeddings are encoded together and the LanceDB queries run
+    concurrently, BATCH_DB_CONCURRENCY at a time.
+    """
+    started = time.perf_counter()
+    table = require_table()
+    actress_index = resources["actress_index"]
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    queries = request.queries
+
+    # 1. Detect Logic
+    plans = [plan_query(item.q, actress_index, item.nprobes, item.refine_factor) for item in queries]
+
+    slots = asyncio.Semaphore(BATCH_DB_CONCURRENCY)
+
+    # 2. Index-only paths, concurrently
+    responses = await asyncio.gather(
+        *(bounded(slots, lookup_search, table, plan, item.top_k) for plan, item in zip(plans, queries))
+    )
+
+    # 3. One encode for everything left
+    pending = [i for i, response in enumerate(responses) if response is None]
+    vectors = await encode_queries([queries[i].q for i in pending])
+
+    # 4. DB Query + Re-Rank, concurrently
+    searched = await asyncio.gather(
+        *(
+            bounded(slots, vector_search, table, plans[i], vec, queries[i].top_k, queries[i].threshold)
+            for i, vec in zip(pending, vectors)
+        )
+    )
+    for i, response in zip(pending, searched):
+        responses[i] = response
+
+    body = serialize({"count": len(responses), "responses": responses}, "batch")
+    record_request("batch", "batch", started)
+    return body
+
+
+def ws_source_row(table, dvd_id):
+    """The video /ws/similar starts from, vector included; None if unknown."""
+    if resources["has_dvdid_key"]:
+        source_filter = video_index.dvdid_key_filter(video_index.dvdid_key(dvd_id))
+    else:
+        source_filter = f"dvdid = {video_index.sql_quote(dvd_id)}"
+
+    # The only place a vector leaves the table: the single source row
+    rows = (
+        table.search()
+        .where(source_filter)
+        .select(resources["result_columns"] + ["vector"])
+        .limit(10)
+        .to_arrow()
+        .to_pylist()
+    )
+    # Several IDs can share a key ("ABC-1" / "ABC1"); prefer the literal one
+    exact_rows = [row for row in rows if row["dvdid"] == dvd_id]
+    if exact_rows:
+        rows = exact_rows
+    return rows[0] if rows else None
+
+
+def ws_candidates(table, source_row, top_k, nprobes=None, refine_factor=None):
+    """Live neighbour query, for when the precomputed sidecar can't answer."""
+    if resources["exact_index"] is not None:
+        return exact_candidates(table, source_row["vector"], top_k * 3, WS_MODE, exclude=source_row["dvdid"])
+
+    with Timer("lancedb_query", WS_MODE, log=True):
+        return (
+            ann_query(table, source_row["vector"], nprobes, refine_factor)
+            # The stored ID, which the key lookup may have matched in another spelling
+            .where(f"dvdid != {video_index.sql_quote(source_row['dvdid'])}")
+            .select(resources["result_columns"])
+            .limit(top_k * 3)
+            .to_arrow()
+        )
+
+
+def match_payloads(results, top_k, threshold):
+    """
+    The /ws/similar matches, best first: rows scoring at least threshold, at
+    most top_k. Cut off on the Arrow columns; only the kept rows become dicts.
+    """
+    if results.num_rows == 0:
+        return []
+    scores = 1 - results["_distance"].to_numpy()
+    keep = np.flatnonzero(scores >= threshold)[:top_k]
+    rows = results.take(pa.array(keep, type=pa.int64())).to_pylist()
+    return [{"data": row, "score": score, "sem_score": score} for row, score in zip(rows, scores[keep].tolist())]
+
+
+async def send_frame(websocket, frame):
+    await websocket.send_text(serialization.dumps(frame).decode())
+
+
+async def similar_request(websocket, session, config):
+    """
+    One request on a /ws/similar session: source, matches, done.
+    Every frame carries the request's request_id. With batch_size above 1 the
+    matches go out as "matches" frames of up to batch_size, or fewer once
+    batch_ms have passed since the previous frame.
+    """
+    request_id = config.get("request_id")
+
     try:
-        config = await websocket.receive_json()
+        # Malformed values end up in the error frame below, tagged with the request_id
         dvd_id = config.get("dvd_id", "")
         top_k = int(config.get("top_k", 20))
         threshold = float(config.get("threshold", 0.65))
+        # Optional ANN overrides, capped like the HTTP parameters
+        nprobes = min(max(int(config.get("nprobes") or 0), 0), MAX_NPROBES) or None
+        refine_factor = min(max(int(config.get("refine_factor") or 0), 0), MAX_REFINE_FACTOR) or None
+        batch_size = min(max(int(config.get("batch_size") or WS_BATCH_SIZE), 1), MAX_WS_BATCH_SIZE)
+        batch_ms = float(config.get("batch_ms", WS_BATCH_MS))
+
+        if component_state("db_task") != "ready":
+            await send_frame(websocket, {"type": "error", "request_id": request_id, "message": "DB not ready"})
+            return
+        table = resources["table"]
 
-        table = resources.get("table")
-        if not table:
-             await websocket.send_json({"type": "error", "message": "DB not ready"})
-             await websocket.close()
-             return
-             
-
-        safe_id = dvd_id.replace("'", "''")
         print(f"🔎 WS Search: {dvd_id}")
 
-        with Timer("WS Source Lookup"):
-            source_df = (
-                table.search().where(f"dvdid = '{safe_id}'").limit(1).to_pandas()
+        started = time.perf_counter()
+        # Source rows are kept for the session, so going back to a video (or
+        # changing the sliders) skips the lookup. A reindex starts over.
+        sources = session["sources"]
+        generation = await run_db("fast", cache_generation, table)
+        if session["generation"] != generation:
+            sources.clear()
+            session["generation"] = generation
+        with Timer("ws_source_lookup", WS_MODE, log=True):
+            if dvd_id in sources:
+                sources.move_to_end(dvd_id)
+                source_row = sources[dvd_id]
+            else:
+                source_row = await run_db("fast", ws_source_row, table, dvd_id)
+                if source_row is not None:
+                    sources[dvd_id] = source_row
+                    if len(sources) > WS_SESSION_SOURCES:
+                        sources.popitem(last=False)
+
+        if source_row is None:
+            await send_frame(
+                websocket, {"type": "error", "request_id": request_id, "message": f"ID {dvd_id} not found"}
             )
-
-        if source_df.empty:
-            await websocket.send_json(
-                {"type": "error", "message": f"ID {dvd_id} not found"}
-            )
-            await websocket.close()
             return
 
-        source_row = source_df.iloc[0]
-        source_vector = source_row["vector"]
-
         source_meta = {
             "dvdid": source_row.get("dvdid"),
             "title": source_row.get("title"),
             "image": source_row.get("image"),
             "jptitle": source_row.get("jptitle"),
         }
-        await websocket.send_json({"type": "source", "data": source_meta})
-
-        with Timer("WS LanceDB Vector Search"):
-            results_df = (
-                table.search(source_vector)
-                .where(f"dvdid != '{safe_id}'")
-                .limit(top_k * 3)
-                .to_pandas()
-            )
-
-        with Timer("WS Processing & Streaming"):
-            count = 0
-            for _, row in results_df.iterrows():
-                if count >= top_k:
-                    break
-
-                sem_score = 1 - row.get("_distance", 1.0)
-
-                if sem_score < threshold:
-                    continue
+        await send_frame(websocket, {"type": "source", "request_id": request_id, "data": source_meta})
+
+        with Timer("ws_precomputed_neighbors", WS_MODE, log=True):
+            results = await run_db("fast", precomputed_neighbors, table, source_row["dvdid"], top_k, threshold)
+
+        if results is None:
+            results = await run_db("scan", ws_candidates, table, source_row, top_k, nprobes, refine_factor)
+
+        with Timer("ws_streaming", WS_MODE, log=True):
+            matches = match_payloads(results, top_k, threshold)
+            count = len(matches)
+
+            if batch_size == 1:
+                for payload in matches:
+                    await send_frame(websocket, {"type": "match", "request_id": request_id, "data": payload})
+            else:
+                batch = []
+                flushed = time.perf_counter()
+                for payload in matches:
+                    batch.append(payload)
+                    if len(batch) >= batch_size or (time.perf_counter() - flushed) * 1000 >= batch_ms:
+                        await send_frame(websocket, {"type": "matches", "request_id": request_id, "data": batch})
+                        batch = []
+                        flushed = time.perf_counter()
+                if batch:
+                    await send_frame(websocket, {"type": "matches", "request_id": request_id, "data": batch})
+
+        await send_frame(websocket, {"type": "done", "request_id": request_id, "count": count})
+        record_request("ws_similar", WS_MODE, started)
 
-                row_dict = row.replace({pd.NA: None}).to_dict()
-                if "vector" in row_dict:
-                    del row_dict["vector"]
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ WS Error: {e}")
+        try:
+            await send_frame(websocket, {"type": "error", "request_id": request_id, "message": str(e)})
+        except:
+            pass
 
-                payload = {"data": row_dict, "score": sem_score, "sem_score": sem_score}
 
-                await websocket.send_json({"type": "match", "data": payload})
-                count += 1
+@app.websocket("/ws/similar")
+async def websocket_similar(websocket: WebSocket):
+    """
+    A long-lived session. Each message is a similarity request, tagged with a
+    request_id that its frames echo back; a newer request (or {"type": "cancel"})
+    cancels the one still streaming.
+    """
+    await websocket.accept()
+    session = {"sources": OrderedDict(), "generation": None}
+    in_flight = None
 
-        await websocket.send_json({"type": "done", "count": count})
+    try:
+        while True:
+            try:
+                config = json.loads(await websocket.receive_text())
+            except ValueError:
+                config = None
+            if not isinstance(config, dict):
+                # Not a request at all; whatever is streaming carries on
+                await send_frame(
+                    websocket, {"type": "error", "request_id": None, "message": "Expected a JSON object"}
+                )
+                continue
+            if in_flight is not None and not in_flight.done():
+                in_flight.cancel()
+                # Stopped at its next await, before the new request sends anything
+                await asyncio.gather(in_flight, return_exceptions=True)
+            if config.get("type") == "cancel":
+                continue
+            in_flight = asyncio.create_task(similar_request(websocket, session, config))
 
     except WebSocketDisconnect:
         print("🔌 WS: Client disconnected")
     except Exception as e:
         print(f"❌ WS Error: {e}")
-        try:
-            await websocket.send_json({"type": "error", "message": str(e)})
-        except:
-            pass
     finally:
+        if in_flight is not None:
+            in_flight.cancel()
         try:
             await websocket.close()
         except:
             pass
 
 
-
-@app.get("/api/actress_top_videos")
-async def get_actress_top_videos(name: str):
+def actress_top_videos(name):
+    """Profile plus the 5 latest videos, for the knowledge panel."""
     # 1. Fetch Profile
-    profile = search_engine.find_profile(name)
+    with Timer("profile_lookup", TOP_VIDEOS_MODE):
+        profile = search_engine.find_profile(name)
     
     if not profile:
         return {"profile": None, "videos": []}
         
     # 2. Search Videos
-    table = resources.get("table")
-    if not table:
-         return {"profile": None, "videos": []}
+    table = resources["table"]
 
-    try:
-        # Use the name found in the profile to be consistent
-        search_name = profile.get("name", name).replace("'", "''")
-        
-        videos_df = (
+    # Use the name found in the profile to be consistent
+    search_name = profile.get("name", name)
+    
+    with Timer("lancedb_query", TOP_VIDEOS_MODE):
+        videos = (
             table.search()
-            .where(f"actress_names LIKE '%{search_name}%'")
+            .where(video_index.actress_filter(search_name, resources["has_actress_list"]))
+            .select(resources["result_columns"])
             .limit(50) # Get enough to sort reliable
-            .to_pandas()
+            .to_arrow()
         )
+
+    # Take top 5
+    return {
+        "profile": profile,
+        "videos": serialization.latest_first(videos, 5)
+    }
+
+
+@app.get("/api/actress_top_videos")
+async def get_actress_top_videos(name: str):
+    # Profiles are built by the database loader
+    if component_state("db_task") != "ready":
+        return {"profile": None, "videos": []}
+
+    started = time.perf_counter()
+    generation = await run_db("fast", cache_generation, resources["table"])
+    key = ("top_videos", name)
+    cached = resources["result_cache"].get(generation, key)
+    if cached is not None:
+        record_request("actress_top_videos", "cached", started)
+        return Response(cached, media_type="application/json")
+
+    try:
+        payload = await run_db("scan", actress_top_videos, name)
     except Exception as e:
+        # Not cached: the next request tries again
         print(f"Top Videos Error: {e}")
         return {"profile": None, "videos": []}
 
-    final_videos = []
-    if not videos_df.empty:
-        if "releasedate" in videos_df.columns:
-            videos_df["releasedate"] = pd.to_datetime(videos_df["releasedate"], errors='coerce')
-            videos_df = videos_df.sort_values(by='releasedate', ascending=False)
-        
-        # Take top 5
-        videos_df = videos_df.head(5)
-        
-        for _, row in videos_df.iterrows():
-            row_dict = row.replace({pd.NA: None}).to_dict()
-            if "vector" in row_dict:
-                del row_dict["vector"]
-            if row_dict.get("releasedate"):
-                row_dict["releasedate"] = str(row_dict["releasedate"]).split(" ")[0]
-            final_videos.append(row_dict)
+    body = serialize(payload, TOP_VIDEOS_MODE)
+    resources["result_cache"].put(generation, key, body.body)
+    record_request("actress_top_videos", TOP_VIDEOS_MODE, started)
+    return body
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
 
+@app.get("/readyz")
+async def readyz(response: Response):
+    """
+    Readiness: 200 once the table is open, i.e. ID and actress queries work.
+    Semantic queries may still be waiting on the model (see "model").
+    """
+    status = {"database": component_state("db_task"), "model": component_state("model_task")}
+    if status["database"] != "ready":
+        response.status_code = 503
+    return status
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: per-stage latency histograms and request counters."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/stats")
+async def get_stats():
+    cache = resources.get("query_cache")
+    results = resources.get("result_cache")
     return {
-        "profile": profile,
-        "videos": final_videos
+        "query_cache": cache.stats() if cache else None,
+        "result_cache": results.stats() if results else None,
     }
 
 
@@ -0,0 +1,236 @@
+import re
+from bisect import bisect_left
+from collections import Counter, deque
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# --- CONFIGURATION ---
+FUZZY_CUTOFF = 0.80
+
+
+class FuzzyNameIndex:
+    """
+    Prebuilt lookup for the 2-word fuzzy match in extract_entities.
+
+    SequenceMatcher.ratio() is 2*M/T where M can never exceed the number of
+    characters the two strings share (as multisets). That bound is cheap to
+    compute for every name at once from a per-character inverted index, so
+    only names that could possibly reach the cutoff are scored for real, best
+    bound first, stopping once no remaining name can beat the current match.
+    Ties resolve to the earliest name in actress_db order, exactly like the
+    old linear scan.
+    """
+
+    def __init__(self, names):
+        # Only multi-word names take part in the fuzzy phase
+        entries = [(rank, name) for rank, name in enumerate(names) if " " in name]
+        entries.sort(key=lambda e: len(e[1]))
+
+        self.names = [name for _, name in entries]
+        self.lowered = [name.lower() for name in self.names]
+        self.ranks = np.array([rank for rank, _ in entries], dtype=np.int64)
+        self.lengths = np.array([len(name) for name in self.names], dtype=np.int64)
+        self.lowered_lengths = np.array([len(n) for n in self.lowered], dtype=np.int64)
+
+        # char -> (row ids ascending, occurrence counts)
+        postings = {}
+        for row, n_lower in enumerate(self.lowered):
+            for char, count in Counter(n_lower).items():
+                postings.setdefault(char, ([], []))
+                postings[char][0].append(row)
+                postings[char][1].append(count)
+        self.postings = {
+            char: (np.array(rows, dtype=np.int64), np.array(counts, dtype=np.int64))
+            for char, (rows, counts) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def _shared_chars(self, text, lo, hi):
+        """Multiset character overlap between `text` and every name in rows [lo, hi)."""
+        overlap = np.zeros(hi - lo, dtype=np.int64)
+        for char, q_count in Counter(text).items():
+            posting = self.postings.get(char)
+            if posting is None:
+                continue
+            rows, counts = posting
+            start, end = np.searchsorted(rows, [lo, hi])
+            overlap[rows[start:end] - lo] += np.minimum(counts[start:end], q_count)
+        return overlap
+
+    def _upper_bound(self, text, lo, hi):
+        # Same float expression difflib uses, so the bound is never below the real ratio
+        total = self.lowered_lengths[lo:hi] + len(text)
+        return 2.0 * self._shared_chars(text, lo, hi) / total
+
+    def best_match(self, input_name, reversed_name, cutoff=FUZZY_CUTOFF):
+        """
+        Best multi-word name for a 2-token query, checking both token orders.
+        Returns None if nothing reaches the cutoff.
+        """
+        input_len = len(input_name)
+        min_len = int(input_len * 0.6)
+        max_len = int(input_len * 1.4)
+
+        # Names are sorted by length, so the length filter is a contiguous slice
+        lo = int(np.searchsorted(self.lengths, min_len, side="left"))
+        hi = int(np.searchsorted(self.lengths, max_len, side="right"))
+        if lo >= hi:
+            return None
+
+        bound = np.maximum(
+            self._upper_bound(input_name, lo, hi),
+            self._upper_bound(reversed_name, lo, hi),
+        )
+        candidates = np.nonzero(bound >= cutoff)[0] + lo
+        if len(candidates) == 0:
+            return None
+
+        # Most promising first; ties in original actress_db order
+        bound = bound[candidates - lo]
+        order = np.lexsort((self.ranks[candidates], -bound))
+
+        best_match = None
+        best_score = 0.0
+        best_rank = -1
+        matcher = SequenceMatcher(None)
+        for i in order:
+            row = candidates[i]
+            rank = self.ranks[row]
+            # The old scan kept the first name (by rank) with the highest score,
+            # so nothing left in this order can displace the current best
+            if best_match is not None and (
+                bound[i] < best_score or (bound[i] == best_score and rank > best_rank)
+            ):
+                break
+
+            # seq2 carries the expensive preprocessing, so set it once per name
+            matcher.set_seq2(self.lowered[row])
+            matcher.set_seq1(input_name)
+            score_fwd = matcher.ratio()
+            matcher.set_seq1(reversed_name)
+            score_rev = matcher.ratio()
+            current_max = max(score_fwd, score_rev)
+
+            if current_max >= cutoff and (
+                current_max > best_score or (current_max == best_score and rank < best_rank)
+            ):
+                best_score = current_max
+                best_match = self.names[row]
+                best_rank = rank
+
+        return best_match
+
+
+class NameAutomaton:
+    """
+    Aho-Corasick automaton over lowercased names.
+    One pass over a query reports the highest-priority name (lowest rank)
+    occurring anywhere in it.
+    """
+
+    def __init__(self, names):
+        # Transitions live in one flat dict keyed by (state, char) packed into an int;
+        # a dict per node costs several times more memory at 100k names.
+        self._goto = {}
+        self._fail = [0]
+        self._out = {}  # state -> ascending ranks of names ending exactly here
+        children = [[]]
+
+        for rank, name in enumerate(names):
+            pattern = name.lower()
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                key = (state << 21) | ord(char)
+                nxt = self._goto.get(key)
+                if nxt is None:
+                    nxt = len(self._fail)
+                    self._goto[key] = nxt
+                    self._fail.append(0)
+                    children.append([])
+                    children[state].append((char, nxt))
+                state = nxt
+            self._out.setdefault(state, []).append(rank)
+
+        # Breadth-first failure links, plus a shortcut to the nearest state with output
+        self._out_link = [-1] * len(self._fail)
+        queue = deque(child for _, child in children[0])
+        while queue:
+            state = queue.popleft()
+            for char, child in children[state]:
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ((fallback << 21) | ord(char)) not in self._goto:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto.get((fallback << 21) | ord(char), 0)
+
+                link = self._fail[child]
+                self._out_link[child] = link if link in self._out else self._out_link[link]
+
+    def __len__(self):
+        return len(self._fail)
+
+    def first_match(self, text, min_rank=0):
+        """Lowest rank >= min_rank among all names occurring in `text`, or None."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        out_link = self._out_link
+
+        best = None
+        state = 0
+        for char in text:
+            code = ord(char)
+            while state and ((state << 21) | code) not in goto:
+                state = fail[state]
+            state = goto.get((state << 21) | code, 0)
+
+            hit = state if state in out else out_link[state]
+            while hit > 0:
+                ranks = out[hit]
+                i = bisect_left(ranks, min_rank)
+                if i < len(ranks) and (best is None or ranks[i] < best):
+                    best = ranks[i]
+                hit = out_link[hit]
+
+        return best
+
+
+class ActressIndex:
+    """All name lookups used by extract_entities, built once at startup."""
+
+    def __init__(self, names):
+        self.names = names
+        self.fuzzy = FuzzyNameIndex(names)
+        self.automaton = NameAutomaton(names)
+
+    def extract_exact(self, cleaned_query):
+        """
+        Finds every name contained in the (lowercased) query, longest first,
+        removing each one before looking for the next.
+        Returns (remaining_query, found_names).
+
+        Same result as walking self.names in order and testing `name in query`:
+        the automaton jumps straight to the next name that occurs, so the
+        work is one pass per found name instead of one test per known name.
+        """
+        found = []
+        next_rank = 0
+        while True:
+            rank = self.automaton.first_match(cleaned_query, next_rank)
+            if rank is None:
+                break
+            name = self.names[rank]
+            found.append(name)
+            # Remove the name from query to see what's left
+            cleaned_query = re.sub(re.escape(name.lower()), "", cleaned_query, flags=re.IGNORECASE)
+            next_rank = rank + 1
+
+        return cleaned_query, found
+
+    def __len__(self):
+        return len(self.names)
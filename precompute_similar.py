@@ -0,0 +1,243 @@
+import argparse
+import time
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from lancedb.index import BTree
+
+import video_index
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+TABLE_NAME = "videos"
+NEIGHBOR_TABLE = "similar"
+TOP_K = 100  # Neighbours kept per video
+MIN_SCORE = 0.0  # Neighbours below this cosine score are not stored
+QUERY_CHUNK = 1024  # Rows whose neighbours are computed together
+CORPUS_CHUNK = 8192  # Rows compared against per step; memory ~ QUERY_CHUNK * (CORPUS_CHUNK + TOP_K)
+
+
+class CodeBook:
+    """dvdid <-> dense int code, so "same video" checks are integer compares."""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def encode(self, ids):
+        out = np.empty(len(ids), dtype=np.int64)
+        for i, dvdid in enumerate(ids):
+            code = self.codes.get(dvdid)
+            if code is None:
+                code = len(self.names)
+                self.codes[dvdid] = code
+                self.names.append(dvdid)
+            out[i] = code
+        return out
+
+
+class RunningTopK:
+    """Best `k` (score, code) pairs per query row, folded in one corpus chunk at a time."""
+
+    def __init__(self, rows, k):
+        self.k = k
+        self.scores = np.full((rows, k), -np.inf, dtype=np.float32)
+        self.codes = np.full((rows, k), -1, dtype=np.int64)
+
+    def update(self, scores, codes):
+        all_scores = np.concatenate([self.scores, scores], axis=1)
+        all_codes = np.concatenate([self.codes, np.broadcast_to(codes, scores.shape)], axis=1)
+        keep = np.argpartition(-all_scores, self.k - 1, axis=1)[:, : self.k]
+        self.scores = np.take_along_axis(all_scores, keep, axis=1)
+        self.codes = np.take_along_axis(all_codes, keep, axis=1)
+
+    def subset(self, rows):
+        sub = RunningTopK(len(rows), self.k)
+        sub.scores = self.scores[rows]
+        sub.codes = self.codes[rows]
+        return sub
+
+    def ranked(self, codebook, min_score):
+        """(neighbour dvdids, scores) per row, best first."""
+        order = np.argsort(-self.scores, axis=1, kind="stable")
+        scores = np.take_along_axis(self.scores, order, axis=1)
+        codes = np.take_along_axis(self.codes, order, axis=1)
+        for row_scores, row_codes in zip(scores, codes):
+            valid = (row_codes >= 0) & (row_scores >= min_score)
+            yield [codebook.names[c] for c in row_codes[valid]], row_scores[valid].tolist()
+
+
+def stream_vectors(table, batch_size, where=None):
+    """(dvdids, float32 matrix) chunks of the videos table, never the whole thing at once."""
+    query = table.search().select(["dvdid", "vector"])
+    if where:
+        query = query.where(where)
+    for batch in query.limit(None).to_batches(batch_size):
+        if batch.num_rows == 0:
+            continue
+        ids = batch.column("dvdid").to_pylist()
+        vectors = np.stack(batch.column("vector").to_numpy(zero_copy_only=False)).astype(np.float32)
+        yield ids, vectors
+
+
+def fold_corpus(acc, q_codes, query_vectors, corpus_chunks, codebook):
+    for c_ids, c_vectors in corpus_chunks:
+        c_codes = codebook.encode(c_ids)
+        scores = query_vectors @ c_vectors.T
+        # A video is never its own neighbour (matches the live `dvdid != ...` filter)
+        scores[q_codes[:, None] == c_codes[None, :]] = -np.inf
+        acc.update(scores, c_codes)
+
+
+def neighbor_batch(ids, acc, codebook, k, min_score):
+    neighbors, scores = [], []
+    for row_neighbors, row_scores in acc.ranked(codebook, min_score):
+        neighbors.append(row_neighbors)
+        scores.append(row_scores)
+    return pa.table(
+        {
+            "dvdid": pa.array(ids, type=pa.string()),
+            "neighbors": pa.array(neighbors, type=pa.list_(pa.string())),
+            "scores": pa.array(scores, type=pa.list_(pa.float32())),
+            "k": pa.array([k] * len(ids), type=pa.int32()),
+            "min_score": pa.array([min_score] * len(ids), type=pa.float32()),
+        }
+    )
+
+
+def upsert(table, data):
+    table.merge_insert("dvdid").when_matched_update_all().when_not_matched_insert_all().execute(data)
+
+
+def build_full(db, videos, k, min_score):
+    codebook = CodeBook()
+    sidecar = None
+    done = 0
+    total = len(videos)
+    started = time.perf_counter()
+
+    for q_ids, q_vectors in stream_vectors(videos, QUERY_CHUNK):
+        q_codes = codebook.encode(q_ids)
+        acc = RunningTopK(len(q_ids), k)
+        fold_corpus(acc, q_codes, q_vectors, stream_vectors(videos, CORPUS_CHUNK), codebook)
+
+        data = neighbor_batch(q_ids, acc, codebook, k, min_score)
+        if sidecar is None:
+            sidecar = db.create_table(NEIGHBOR_TABLE, data=data, mode="overwrite")
+        else:
+            sidecar.add(data)
+
+        done += len(q_ids)
+        rate = done / (time.perf_counter() - started)
+        print(f"   {done}/{total} videos ({rate:.0f}/s)")
+
+    return sidecar
+
+
+def build_incremental(db, videos, k, min_score):
+    sidecar = db.open_table(NEIGHBOR_TABLE)
+    stored_ids = set(
+        sidecar.search().select(["dvdid"]).limit(None).to_arrow().column("dvdid").to_pylist()
+    )
+    all_ids = videos.search().select(["dvdid"]).limit(None).to_arrow().column("dvdid").to_pylist()
+    new_ids = sorted(set(all_ids) - stored_ids)
+
+    if not new_ids:
+        print("✅ Neighbour table already covers every video.")
+        return sidecar
+    print(f"🆕 {len(new_ids)} new videos.")
+
+    codebook = CodeBook()
+
+    # 1. New videos: full neighbour lists against the whole corpus
+    for start in range(0, len(new_ids), QUERY_CHUNK):
+        chunk_ids = new_ids[start : start + QUERY_CHUNK]
+        for q_ids, q_vectors in stream_vectors(videos, QUERY_CHUNK, where=video_index.dvdid_in_filter(chunk_ids)):
+            acc = RunningTopK(len(q_ids), k)
+            fold_corpus(acc, codebook.encode(q_ids), q_vectors, stream_vectors(videos, CORPUS_CHUNK), codebook)
+            upsert(sidecar, neighbor_batch(q_ids, acc, codebook, k, min_score))
+    print("   New videos done.")
+
+    # 2. Existing videos: only the new rows can enter their lists.
+    # The new rows are the corpus for this pass, so they are held in memory.
+    new_codes = set(codebook.encode(new_ids).tolist())
+    new_chunks = [
+        (ids, vectors)
+        for start in range(0, len(new_ids), CORPUS_CHUNK)
+        for ids, vectors in stream_vectors(
+            videos, CORPUS_CHUNK, where=video_index.dvdid_in_filter(new_ids[start : start + CORPUS_CHUNK])
+        )
+    ]
+
+    updated = 0
+    new_set = set(new_ids)
+    for q_ids, q_vectors in stream_vectors(videos, QUERY_CHUNK):
+        keep = [i for i, dvdid in enumerate(q_ids) if dvdid not in new_set]
+        if not keep:
+            continue
+        q_ids = [q_ids[i] for i in keep]
+        q_vectors = q_vectors[keep]
+        q_codes = codebook.encode(q_ids)
+
+        # Seed the accumulator with the stored lists
+        stored = (
+            sidecar.search()
+            .where(video_index.dvdid_in_filter(q_ids))
+            .select(["dvdid", "neighbors", "scores"])
+            .limit(len(q_ids))
+            .to_arrow()
+        )
+        stored = {row["dvdid"]: row for row in stored.to_pylist()}
+        acc = RunningTopK(len(q_ids), k)
+        for i, dvdid in enumerate(q_ids):
+            row = stored.get(dvdid)
+            if not row:
+                continue
+            n = min(len(row["neighbors"]), k)
+            acc.scores[i, :n] = row["scores"][:n]
+            acc.codes[i, :n] = codebook.encode(row["neighbors"][:n])
+
+        fold_corpus(acc, q_codes, q_vectors, new_chunks, codebook)
+
+        # Only rewrite rows whose list actually gained a new video
+        gained = np.isin(acc.codes, list(new_codes)).any(axis=1)
+        if gained.any():
+            rows = np.nonzero(gained)[0]
+            changed_ids = [q_ids[i] for i in rows]
+            upsert(sidecar, neighbor_batch(changed_ids, acc.subset(rows), codebook, k, min_score))
+            updated += len(rows)
+
+    print(f"   {updated} existing videos gained new neighbours.")
+    return sidecar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute 'more like this' neighbours for /ws/similar.")
+    parser.add_argument("--incremental", action="store_true", help="Only process videos added since the last run")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+    args = parser.parse_args()
+
+    print("🔌 Connecting to LanceDB...")
+    db = lancedb.connect(DB_FOLDER)
+    videos = db.open_table(TABLE_NAME)
+    print(f"📊 {len(videos)} videos.")
+
+    started = time.perf_counter()
+    if args.incremental and NEIGHBOR_TABLE in db.table_names():
+        sidecar = build_incremental(db, videos, args.top_k, args.min_score)
+    else:
+        print(f"🧮 Computing top-{args.top_k} neighbours for every video...")
+        sidecar = build_full(db, videos, args.top_k, args.min_score)
+
+    if sidecar is None:
+        print("❌ No videos found.")
+        return
+
+    sidecar.create_index("dvdid", config=BTree(), replace=True)
+    print(f"\n✅ '{NEIGHBOR_TABLE}' ready: {len(sidecar)} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
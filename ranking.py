@@ -0,0 +1,142 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --- CONFIGURATION ---
+ID_BOOST = 2.0
+ACTRESS_BOOST = 1.5
+KEYWORD_BOOST = 0.15  # Only without a full-text index (see FUSION_BOOST)
+FUSION_BOOST = 0.3  # Max boost for a row ranked first by both ANN and BM25
+RRF_K = 60  # Reciprocal-rank fusion constant
+RELAXED_MARGIN = 0.15  # Threshold slack when an ID or actress was detected
+
+
+def _text_column(results, name):
+    """Lowercased string column with nulls as empty strings."""
+    if name not in results.column_names:
+        return pa.array([""] * results.num_rows, type=pa.string())
+    column = pc.cast(results[name], pa.string())
+    return pc.utf8_lower(pc.fill_null(column, ""))
+
+
+def rrf_scores(ann_ranks, fts_ranks):
+    """
+    Reciprocal-rank fusion of two 1-based rank arrays (0 = not returned by that
+    query), scaled so a row ranked first by both scores 1.0.
+    """
+    total = np.zeros(len(ann_ranks))
+    for ranks in (ann_ranks, fts_ranks):
+        ranks = np.asarray(ranks, dtype=np.float64)
+        total += np.where(ranks > 0, 1.0 / (RRF_K + ranks), 0.0)
+    return total * (RRF_K + 1) / 2
+
+
+def hybrid_scores(results, query_tokens, is_pure_id_search, detected_cast, ranks=None):
+    """
+    Scores every candidate row at once, straight from the Arrow columns.
+    `ranks` is (ann_ranks, fts_ranks) when a full-text query ran alongside the ANN one.
+    Returns (final_scores, semantic_scores) as float arrays aligned with `results`.
+    """
+    n = results.num_rows
+    if "_distance" in results.column_names:
+        distance = pc.fill_null(results["_distance"], 1.0).to_numpy().astype(np.float64)
+    else:
+        distance = np.ones(n)
+    sem_scores = 1 - distance
+    boost = np.zeros(n)
+
+    # 1. ID Boost
+    if is_pure_id_search:
+        clean_query = query_tokens[0].replace(" ", "-") if query_tokens else ""
+        dvdid = pc.replace_substring(_text_column(results, "dvdid"), " ", "-")
+        hit = pc.match_substring(dvdid, clean_query).to_numpy(zero_copy_only=False)
+        boost += np.where(hit, ID_BOOST, 0.0)
+
+    # 2. Actress Boost (once per row, however many of the cast appear)
+    if detected_cast:
+        row_cast = _text_column(results, "actress_names")
+        hit = np.zeros(n, dtype=bool)
+        for cast_name in detected_cast:
+            hit |= pc.match_substring(row_cast, cast_name.lower()).to_numpy(zero_copy_only=False)
+        boost += np.where(hit, ACTRESS_BOOST, 0.0)
+
+    # 3. Keyword Boost
+    # With a full-text index, BM25 has already matched the words: fuse its
+    # ranking with the ANN one instead of re-scanning every row's text.
+    if ranks is not None:
+        boost += rrf_scores(*ranks) * FUSION_BOOST
+    # Tokens never contain whitespace, so matching the joined blob is the same
+    # as matching each column; the join just keeps it to one scan per token.
+    elif query_tokens:
+        text_blob = pc.binary_join_element_wise(
+            _text_column(results, "title"),
+            _text_column(results, "jptitle"),
+            _text_column(results, "dvdid"),
+            " ",
+        )
+        matches = np.zeros(n)
+        for token in query_tokens:
+            matches += pc.match_substring(text_blob, token).to_numpy(zero_copy_only=False)
+        boost += (matches / len(query_tokens)) * KEYWORD_BOOST
+
+    return sem_scores + boost, sem_scores
+
+
+def passes_threshold(final_scores, sem_scores, threshold, relaxed):
+    if relaxed:
+        return (final_scores > 1.0) | (sem_scores > (threshold - RELAXED_MARGIN))
+    return sem_scores > threshold
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first.
+    Equal scores keep their original order, like a stable descending sort.
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < len(scores):
+        kth_best = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.nonzero(scores >= kth_best)[0]
+    else:
+        candidates = np.arange(len(scores))
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+def to_records(results, indices):
+    """Only the rows that made the cut become Python dicts."""
+    if "vector" in results.column_names:
+        results = results.drop_columns(["vector"])
+    return results.take(pa.array(indices, type=pa.int64())).to_pylist()
+
+
+def rank(results, query_tokens, is_pure_id_search, detected_cast, threshold, top_k, ranks=None):
+    """
+    Hybrid score, threshold and top-k over a LanceDB Arrow result.
+    Returns (winner row indices best first, final_scores, semantic_scores).
+    """
+    final_scores, sem_scores = hybrid_scores(results, query_tokens, is_pure_id_search, detected_cast, ranks)
+
+    relaxed = bool(is_pure_id_search or detected_cast)
+    passed = np.nonzero(passes_threshold(final_scores, sem_scores, threshold, relaxed))[0]
+    winners = passed[top_k_indices(final_scores[passed], top_k)]
+    return winners, final_scores, sem_scores
+
+
+def scored_records(results, winners, final_scores, sem_scores):
+    """Result entries for `winners` (any slice of what rank() returned)."""
+    rows = to_records(results, winners)
+    return [
+        {"data": row, "score": float(final_scores[i]), "sem_score": float(sem_scores[i])}
+        for row, i in zip(rows, winners)
+    ]
+
+
+def rerank(results, query_tokens, is_pure_id_search, detected_cast, threshold, top_k, ranks=None):
+    winners, final_scores, sem_scores = rank(
+        results, query_tokens, is_pure_id_search, detected_cast, threshold, top_k, ranks
+    )
+    return scored_records(results, winners, final_scores, sem_scores)
@@ -2,10 +2,13 @@ import glob
 import json
 import os
 import re
+import threading
+import time
 
 # --- CONFIGURATION ---
 BATCH_PATTERN = "cast/CASTS_batch_*.json"
 PROFILE_DB_FILE = "final_actress_profiles.json" 
+RELOAD_CHECK_INTERVAL = 30  # Seconds between checks of the source files' mtimes
 
 def normalize(text):
     if not text:
@@ -26,47 +29,142 @@ def load_profile_db():
     except Exception:
         return {}
 
-def search_all(query):
-    norm_query = normalize(query)
-    files = glob.iglob(BATCH_PATTERN)
-    
-    exact_matches = []
-    seen_slugs = set()
-    files_found = False
-
-    for filepath in files:
-        files_found = True
+def source_mtimes():
+    """Modification times of every file the profile index is built from."""
+    stamps = {}
+    for path in [*sorted(glob.glob(BATCH_PATTERN)), PROFILE_DB_FILE]:
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                items = data.get("casts", data) if isinstance(data, dict) else data
-                if not isinstance(items, list): continue
-
-                for item in items:
-                    raw_name = item.get("name", "")
-                    slug = item.get("slug", "")
-                    
-                    if not raw_name or not slug: continue
-                    if slug in seen_slugs: continue
-
-                    if normalize(raw_name) == norm_query:
-                        seen_slugs.add(slug)
+            stamps[path] = os.path.getmtime(path)
+        except OSError:
+            continue
+    return stamps
+
+
+class ProfileIndex:
+    """
+    Resident copy of the cast batches and the profile DB.
+
+    matches:  normalized name -> basic match data per slug, in first-seen order
+    profiles: slug -> full profile from PROFILE_DB_FILE
+    Merged, tier-normalized results are memoized per known name on first
+    lookup, so the memo never outgrows `matches` whatever clients send.
+    """
+
+    def __init__(self, matches, profiles, mtimes):
+        self.matches = matches
+        self.profiles = profiles
+        self.mtimes = mtimes
+        self._merged = {}
+
+    @classmethod
+    def build(cls):
+        mtimes = source_mtimes()
+        matches = {}
+
+        for filepath in glob.iglob(BATCH_PATTERN):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    items = data.get("casts", data) if isinstance(data, dict) else data
+                    if not isinstance(items, list): continue
+
+                    for item in items:
+                        raw_name = item.get("name", "")
+                        slug = item.get("slug", "")
+
+                        if not raw_name or not slug: continue
+
+                        by_slug = matches.setdefault(normalize(raw_name), {})
+                        if slug in by_slug: continue
+
                         # Basic Match Data
-                        exact_matches.append({
+                        by_slug[slug] = {
                             "slug": slug,
                             "name": raw_name,
                             "jpName": item.get("jpName", "N/A"),
                             "id": item.get("_id", ""),
                             "link": item.get("link", ""),
                             "avatar": item.get("avatar", None)
-                        })
-        except:
-            continue
+                        }
+            except:
+                continue
+
+        return cls(matches, load_profile_db(), mtimes)
+
+    def search(self, query):
+        return [dict(match) for match in self.matches.get(normalize(query), {}).values()]
+
+    def lookup(self, query):
+        norm_query = normalize(query)
+        if norm_query in self._merged:
+            return dict(self._merged[norm_query])
+
+        # Unknown names are not memoized: the miss is a dict lookup already
+        by_slug = self.matches.get(norm_query)
+        if not by_slug:
+            return None
+
+        # Lowest slug wins
+        slug = min(by_slug)
+        final_result = dict(by_slug[slug])
+
+        if slug in self.profiles:
+            final_result.update(self.profiles[slug])
 
-    if not files_found:
-        return []
+        # Normalize nested Wiki data to top-level if needed
+        final_result = normalize_tier3(final_result)
 
-    return exact_matches
+        # Calculate Tier
+        final_result["tier"] = determine_tier(final_result)
+
+        self._merged[norm_query] = final_result
+        return dict(final_result)
+
+
+_index = None
+_index_lock = threading.Lock()
+_last_check = 0.0
+_reloading = False
+
+
+def _reload():
+    global _index, _reloading
+    try:
+        fresh = ProfileIndex.build()
+        _index = fresh  # Single reference swap; readers see old or new, never half
+        print(f"🔄 Profile index reloaded: {len(fresh.matches)} names")
+    except Exception as e:
+        print(f"❌ Profile index reload failed: {e}")
+    finally:
+        _reloading = False
+
+
+def get_index():
+    """
+    The resident ProfileIndex. Built on first use; afterwards rebuilt in a
+    background thread whenever the source files change on disk.
+    """
+    global _index, _last_check, _reloading
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ProfileIndex.build()
+                _last_check = time.monotonic()
+        return _index
+
+    now = time.monotonic()
+    if now - _last_check >= RELOAD_CHECK_INTERVAL:
+        _last_check = now
+        if not _reloading and source_mtimes() != _index.mtimes:
+            _reloading = True
+            threading.Thread(target=_reload, name="profile-reload", daemon=True).start()
+
+    return _index
+
+
+def search_all(query):
+    return get_index().search(query)
 
 def normalize_tier3(profile):
     """
@@ -165,31 +263,6 @@ def determine_tier(profile):
 def find_profile(query):
     """
     Main entry point for the server. 
-    Performs search, merges profile, normalizes data, and calculates Tier.
+    Looks the name up in the resident index: merged profile, normalized data and Tier.
     """
-    results = search_all(query)
-
-    if not results:
-        return None
-
-    # Sort by slug
-    results.sort(key=lambda x: x['slug'])
-
-    # Load profiles
-    profile_map = load_profile_db()
-    
-    # Merge Logic
-    final_result = results[0] 
-    slug = final_result["slug"]
-    
-    if slug in profile_map:
-        full_profile = profile_map[slug]
-        final_result.update(full_profile)
-    
-    # Normalize nested Wiki data to top-level if needed
-    final_result = normalize_tier3(final_result)
-    
-    # Calculate Tier
-    final_result["tier"] = determine_tier(final_result)
-        
-    return final_result
\ No newline at end of file
+    return get_index().lookup(query)
@@ -0,0 +1,64 @@
+# JSON bodies for every endpoint, encoded with orjson. Result rows come
+# straight from LanceDB's Arrow columns (nulls are already None); numpy
+# scalars and arrays are native to orjson, NaN becomes null, and the few
+# pandas values that can reach a payload are handled by `default`.
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fastapi.responses import Response
+
+# --- CONFIGURATION ---
+DATE_FORMAT = "%Y-%m-%d"  # How release dates are sent
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def default(value):
+    """The values orjson doesn't know: pandas NA/NaT and Timestamps."""
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(DATE_FORMAT)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=default, option=OPTIONS)
+
+
+def response(payload):
+    return Response(dumps(payload), media_type="application/json")
+
+
+def ndjson(frame):
+    return orjson.dumps(frame, default=default, option=OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+def parse_dates(column):
+    """
+    A date column as Arrow timestamps; values pandas can't parse become null.
+    Parsed the way the endpoints always have (pd.to_datetime, errors="coerce").
+    """
+    parsed = pd.to_datetime(column.to_pandas(), errors="coerce")
+    return pa.array(parsed.to_numpy(dtype="datetime64[ns]"), mask=parsed.isna().to_numpy())
+
+
+def latest_first(results, top_k, column="releasedate"):
+    """
+    The top_k rows with the newest `column` date (unparseable dates last), with
+    that column formatted as DATE_FORMAT. Only the kept rows become dicts.
+    """
+    if results.num_rows == 0:
+        return []
+    if column not in results.column_names:
+        return results.slice(0, top_k).to_pylist()
+
+    dates = parse_dates(results[column])
+    # The sort the pandas version did, so ties keep their order
+    order = pd.Series(dates.to_numpy(zero_copy_only=False)).sort_values(ascending=False).index[:top_k]
+    order = pa.array(np.asarray(order), type=pa.int64())
+    formatted = pc.strftime(dates.take(order), format=DATE_FORMAT)
+    kept = results.take(order)
+    return kept.set_column(kept.schema.get_field_index(column), column, formatted).to_pylist()
@@ -4,6 +4,8 @@ import { createResultCard, renderError, renderKnowledgePanel, createEntityHeader
 import { withTransition } from "./utils.js";
 import { closeWebSocket } from "./socket.js";
 
+let activeStream = null;
+
 export async function performStandardSearch(
   query,
   limit,
@@ -14,6 +16,10 @@ export async function performStandardSearch(
   if (!query.trim()) return;
 
   closeWebSocket();
+  // A newer search wins; frames from the old stream must not land on the page
+  if (activeStream) activeStream.abort();
+  const controller = new AbortController();
+  activeStream = controller;
 
   const startLoadingState = () => {
     setResultsMode();
@@ -28,7 +34,8 @@ export async function performStandardSearch(
     startLoader();
   };
 
-  if (animate) withTransition(startLoadingState);
+  let loading = Promise.resolve();
+  if (animate) loading = withTransition(startLoadingState);
   else startLoadingState();
 
   if (pushState) {
@@ -40,119 +47,162 @@ export async function performStandardSearch(
     window.history.pushState({}, "", url);
   }
 
-  const apiUrl = `/api/search?q=${encodeURIComponent(query)}&top_k=${limit}&threshold=${threshold}`;
+  const apiUrl = `/api/search/stream?q=${encodeURIComponent(query)}&top_k=${limit}&threshold=${threshold}`;
 
-  try {
-    const response = await fetch(apiUrl);
-    if (!response.ok) throw new Error("API Error");
-    const data = await response.json();
+  let mode = "";
+  let count = 0;
+  let painted = null;
+  const items = [];
 
-    const renderNewContent = () => {
+  // First frame with something to show replaces the loader; later ones append
+  const firstPaint = () => {
+    if (painted) return painted;
+    const clear = () => {
       stopLoader();
-
-      const count = data.results.length;
-      updateMeta(`About ${count} results <span style="margin: 0 10px">•</span> Mode: ${data.mode}`);
-
       elements.resultsList.innerHTML = "";
       elements.knowledgePanel.innerHTML = "";
 
       // Reset Sidebar Visibility
       elements.knowledgePanel.classList.add("hidden");
       elements.body.classList.remove("has-sidebar");
+    };
+    // Never before the loader itself has gone up
+    painted = loading.then(() => (animate ? withTransition(clear) : clear()));
+    return painted;
+  };
 
-      if (count === 0) {
-        elements.resultsList.innerHTML = `<p style="padding:20px;color:#bdc1c6;">No results found.</p>`;
-        return;
+  const handleFrame = async (msg) => {
+    if (msg.type === "meta") {
+      mode = msg.mode;
+      updateMeta(`Mode: ${mode} <span style="margin: 0 10px">•</span> Searching...`);
+    } else if (msg.type === "bio") {
+      // CHECK FOR BIO ITEM (sent before the timeline query runs)
+      await firstPaint();
+      count++;
+      const tier = msg.data.data.tier || 0;
+
+      // TIER 1+: Render "Mini Header" at top of results list
+      if (tier >= 1) {
+        elements.resultsList.appendChild(createEntityHeader(msg.data.data));
       }
 
+      // TIER 2+: Render Sidebar (Knowledge Panel)
+      if (tier >= 2) {
+        elements.knowledgePanel.innerHTML = renderKnowledgePanel(msg.data.data);
+        elements.knowledgePanel.classList.remove("hidden");
+        elements.body.classList.add("has-sidebar");
+      }
+    } else if (msg.type === "results") {
+      await firstPaint();
       const fragment = document.createDocumentFragment();
-
-      data.results.forEach((item) => {
-        // CHECK FOR BIO ITEM
-        if (item.is_bio || item.data.type === 'bio') {
-          const tier = item.data.tier || 0;
-
-          // TIER 1+: Render "Mini Header" at top of results list
-          if (tier >= 1) {
-            fragment.appendChild(createEntityHeader(item.data));
-          }
-
-          // TIER 2+: Render Sidebar (Knowledge Panel)
-          if (tier >= 2) {
-            elements.knowledgePanel.innerHTML = renderKnowledgePanel(item.data);
-            elements.knowledgePanel.classList.remove("hidden");
-            elements.body.classList.add("has-sidebar");
-          }
-
-        } else {
-          // Standard Video Card
-          fragment.appendChild(createResultCard(item.data, item.sem_score));
-        }
+      msg.results.forEach((item) => {
+        // Standard Video Card
+        fragment.appendChild(createResultCard(item.data, item.sem_score));
+        items.push(item);
       });
-
+      count += msg.results.length;
       elements.resultsList.appendChild(fragment);
+    } else if (msg.type === "done") {
+      mode = msg.mode;
+      await firstPaint();
+      updateMeta(`About ${count} results <span style="margin: 0 10px">•</span> Mode: ${mode}`);
 
-      // --- NEW: Check for Dominant Actress (>= 60%) ---
-      const actressCounts = {};
-      let totalVideos = 0;
-
-      data.results.forEach((item) => {
-        // Skip bio items
-        if (item.is_bio || (item.data && item.data.type === 'bio')) return;
-
-        totalVideos++;
-        const row = item.data;
-        if (row && row.actress_names) {
-          const names = row.actress_names.split(",").map(n => n.trim());
-          names.forEach(name => {
-            if (name) actressCounts[name] = (actressCounts[name] || 0) + 1;
-          });
-        }
-      });
-
-      if (totalVideos > 0) {
-        let dominantActress = null;
-        // Check if any actress appears in >= 60% of videos
-        for (const [name, count] of Object.entries(actressCounts)) {
-          if (count / totalVideos >= 0.6) {
-            dominantActress = name;
-            break;
-          }
-        }
-
-        if (dominantActress) {
-          // Determine if we should append to existing panel or start new
-          // If we already rendered a bio for this actress (Tier 2), we might duplicate info?
-          // But the user said "do this after load complete" and "add functionality to knowledge panel".
-          // If existing panel shows "About", this adds "You would like these video...".
-          // So appending is correct.
-
-          fetch(`/api/actress_top_videos?name=${encodeURIComponent(dominantActress)}`)
-            .then(res => res.json())
-            .then(recData => {
-              if (recData.profile && recData.videos && recData.videos.length > 0) {
-                const kpHtml = renderActressRecommendations(recData.profile, recData.videos);
-
-                // If panel was hidden (no purely High Tier bio result), show it now
-                if (elements.knowledgePanel.classList.contains("hidden")) {
-                  elements.knowledgePanel.classList.remove("hidden");
-                  elements.body.classList.add("has-sidebar");
-                }
-
-                const div = document.createElement("div");
-                div.innerHTML = kpHtml;
-                elements.knowledgePanel.appendChild(div);
-              }
-            })
-            .catch(err => console.error("Rec Error:", err));
-        }
+      if (count === 0) {
+        elements.resultsList.innerHTML = `<p style="padding:20px;color:#bdc1c6;">No results found.</p>`;
+        return;
       }
-    };
+      checkDominantActress(items);
+    } else if (msg.type === "error") {
+      throw new Error(msg.retry_after ? `${msg.message} (try again in ${msg.retry_after}s)` : msg.message);
+    }
+  };
 
-    if (animate) withTransition(renderNewContent);
-    else renderNewContent();
+  try {
+    const response = await fetch(apiUrl, { signal: controller.signal });
+    if (response.status === 503) {
+      // Still starting up: the table or the model is loading
+      const wait = response.headers.get("Retry-After");
+      throw new Error(wait ? `Server is starting up, try again in ${wait}s` : "Server unavailable");
+    }
+    if (!response.ok) throw new Error("API Error");
+
+    // NDJSON: one frame per line, handled as soon as the line is complete
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let newline;
+      while ((newline = buffer.indexOf("\n")) >= 0) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (line) await handleFrame(JSON.parse(line));
+      }
+    }
   } catch (error) {
+    if (error.name === "AbortError") return;
     stopLoader(); // STOP LOADER ON ERROR
     elements.resultsList.innerHTML = renderError(error.message);
   }
-}
\ No newline at end of file
+}
+
+function checkDominantActress(items) {
+  // --- NEW: Check for Dominant Actress (>= 60%) ---
+  const actressCounts = {};
+  let totalVideos = 0;
+
+  items.forEach((item) => {
+    // Skip bio items
+    if (item.is_bio || (item.data && item.data.type === 'bio')) return;
+
+    totalVideos++;
+    const row = item.data;
+    if (row && row.actress_names) {
+      const names = row.actress_names.split(",").map(n => n.trim());
+      names.forEach(name => {
+        if (name) actressCounts[name] = (actressCounts[name] || 0) + 1;
+      });
+    }
+  });
+
+  if (totalVideos > 0) {
+    let dominantActress = null;
+    // Check if any actress appears in >= 60% of videos
+    for (const [name, count] of Object.entries(actressCounts)) {
+      if (count / totalVideos >= 0.6) {
+        dominantActress = name;
+        break;
+      }
+    }
+
+    if (dominantActress) {
+      // Determine if we should append to existing panel or start new
+      // If we already rendered a bio for this actress (Tier 2), we might duplicate info?
+      // But the user said "do this after load complete" and "add functionality to knowledge panel".
+      // If existing panel shows "About", this adds "You would like these video...".
+      // So appending is correct.
+
+      fetch(`/api/actress_top_videos?name=${encodeURIComponent(dominantActress)}`)
+        .then(res => res.json())
+        .then(recData => {
+          if (recData.profile && recData.videos && recData.videos.length > 0) {
+            const kpHtml = renderActressRecommendations(recData.profile, recData.videos);
+
+            // If panel was hidden (no purely High Tier bio result), show it now
+            if (elements.knowledgePanel.classList.contains("hidden")) {
+              elements.knowledgePanel.classList.remove("hidden");
+              elements.body.classList.add("has-sidebar");
+            }
+
+            const div = document.createElement("div");
+            div.innerHTML = kpHtml;
+            elements.knowledgePanel.appendChild(div);
+          }
+        })
+        .catch(err => console.error("Rec Error:", err));
+    }
+  }
+}
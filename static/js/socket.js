@@ -8,57 +8,111 @@ import {
 } from "./ui.js";
 import { createResultCard, renderError } from "./render.js";
 
+// Matches per frame: cards are appended a batch at a time
+const MATCH_BATCH_SIZE = 20;
+
+// One socket for the whole page; each similarity request is tagged with an id
+// and frames from an older (cancelled) request are ignored.
 let activeWS = null;
+let pending = [];
+let requestId = 0;
+let handleFrame = null;
 
-export function closeWebSocket() {
-  if (activeWS) {
-    activeWS.close();
+function sendFrame(frame) {
+  if (activeWS && activeWS.readyState === WebSocket.OPEN) {
+    activeWS.send(JSON.stringify(frame));
+  } else {
+    pending.push(frame);
+    openSocket();
+  }
+}
+
+function openSocket() {
+  if (
+    activeWS &&
+    (activeWS.readyState === WebSocket.OPEN ||
+      activeWS.readyState === WebSocket.CONNECTING)
+  ) {
+    return;
+  }
+
+  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+  const wsUrl = `${protocol}//${window.location.host}/ws/similar`;
+
+  activeWS = new WebSocket(wsUrl);
+
+  activeWS.onopen = () => {
+    const frames = pending;
+    pending = [];
+    frames.forEach((frame) => activeWS.send(JSON.stringify(frame)));
+  };
+
+  activeWS.onmessage = (event) => {
+    const msg = JSON.parse(event.data);
+    if (msg.request_id !== requestId || !handleFrame) return;
+    handleFrame(msg);
+  };
+
+  activeWS.onerror = (e) => {
+    console.error("WS Error", e);
+    if (handleFrame) stopLoader();
+  };
+
+  activeWS.onclose = () => {
+    // Reopened by the next request
     activeWS = null;
-    stopLoader(); // Ensure loader stops if socket is forcibly closed
+    if (handleFrame) {
+      handleFrame = null;
+      elements.loader.classList.remove("active");
+    }
+  };
+}
+
+export function closeWebSocket() {
+  // Cancels the request in flight; the socket stays open for the next one
+  if (handleFrame) {
+    handleFrame = null;
+    requestId += 1;
+    pending = [];
+    if (activeWS && activeWS.readyState === WebSocket.OPEN) {
+      activeWS.send(JSON.stringify({ type: "cancel" }));
+    }
+    stopLoader(); // Ensure loader stops if the request is abandoned
   }
 }
 
 export function initSimilarWebSocket(id, limit, threshold) {
-  closeWebSocket();
   setResultsMode();
 
   // START INTERACTIVE LOADER
   startLoader();
   // Override the text immediately for context
   const statusText = document.getElementById("loadingStatusText");
-  if (statusText) statusText.innerText = `Establishing socket for ID: ${id}...`;
+  if (statusText) statusText.innerText = `Searching similar to ID: ${id}...`;
 
   updateMeta(`Mode: Deep Similarity (Streaming...)`);
 
-  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-  const wsUrl = `${protocol}//${window.location.host}/ws/similar`;
-
-  activeWS = new WebSocket(wsUrl);
-
-  activeWS.onopen = () => {
-    activeWS.send(
-      JSON.stringify({ dvd_id: id, top_k: limit, threshold: threshold }),
-    );
-  };
-
   // Flag to know if it's the first result to clear the loader
   let firstResult = true;
 
-  activeWS.onmessage = (event) => {
-    const msg = JSON.parse(event.data);
-
+  requestId += 1;
+  handleFrame = (msg) => {
     if (msg.type === "source") {
       updateSimilarHeader(msg.data.dvdid, msg.data.title, msg.data.image);
       elements.toolsBtn.classList.remove("hidden");
-    } else if (msg.type === "match") {
+    } else if (msg.type === "match" || msg.type === "matches") {
       // CLEAR LOADER ON FIRST MATCH
       if (firstResult) {
         stopLoader();
         elements.resultsList.innerHTML = "";
         firstResult = false;
       }
-      const card = createResultCard(msg.data, msg.data.sem_score);
-      elements.resultsList.appendChild(card);
+      const matches = msg.type === "matches" ? msg.data : [msg.data];
+      const fragment = document.createDocumentFragment();
+      matches.forEach((match) => {
+        fragment.appendChild(createResultCard(match, match.sem_score));
+      });
+      elements.resultsList.appendChild(fragment);
     } else if (msg.type === "done") {
       if (firstResult) {
         // If no matches found but done
@@ -69,20 +123,20 @@ export function initSimilarWebSocket(id, limit, threshold) {
       updateMeta(
         `About ${msg.count} results <span style="margin: 0 10px">•</span> Mode: Deep Similarity`,
       );
-      closeWebSocket(); // This handles stopLoader internally via flag check usually, but redundant is safe
+      handleFrame = null;
     } else if (msg.type === "error") {
       stopLoader();
       elements.resultsList.innerHTML = renderError(msg.message);
-      closeWebSocket();
+      handleFrame = null;
     }
   };
 
-  activeWS.onerror = (e) => {
-    console.error("WS Error", e);
-    stopLoader();
-  };
-
-  activeWS.onclose = () => {
-    elements.loader.classList.remove("active");
-  };
+  // A newer request cancels the one still streaming on the server
+  sendFrame({
+    request_id: requestId,
+    dvd_id: id,
+    top_k: limit,
+    threshold: threshold,
+    batch_size: MATCH_BATCH_SIZE,
+  });
 }
@@ -8,12 +8,13 @@ export async function copyToClipboard(text, element) {
   }
 }
 
+// Resolves once the DOM update has actually run (view transitions defer it)
 export function withTransition(updateCallback) {
   if (!document.startViewTransition) {
     updateCallback();
-    return;
+    return Promise.resolve();
   }
-  document.startViewTransition(updateCallback);
+  return document.startViewTransition(updateCallback).updateCallbackDone;
 }
 
 export function formatDate(dateStr) {
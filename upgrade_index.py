@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import lancedb
+import pyarrow as pa
+
+import video_index
+
+# --- CONFIGURATION ---
+DB_FOLDER = "jav_search_index"
+BACKUP_FOLDER = "jav_search_index_BACKUP"
+TABLE_NAME = "videos"
+VECTOR_INDEX_MIN_ROWS = 10000  # Same cut-off the notebook uses
+
+
+def upgrade_database():
+    if not os.path.exists(DB_FOLDER):
+        print(f"❌ Database folder '{DB_FOLDER}' not found.")
+        return
+
+    print("🛡️ Creating backup of existing database...")
+    if os.path.exists(BACKUP_FOLDER):
+        shutil.rmtree(BACKUP_FOLDER)
+    shutil.copytree(DB_FOLDER, BACKUP_FOLDER)
+    print(f"✅ Backup created at: {BACKUP_FOLDER}")
+
+    print("🔌 Connecting to LanceDB...")
+    db = lancedb.connect(DB_FOLDER)
+
+    if TABLE_NAME not in db.table_names():
+        print(f"❌ Table '{TABLE_NAME}' not found in database.")
+        return
+
+    table = db.open_table(TABLE_NAME)
+    print(f"📊 Loaded {len(table)} rows.")
+
+    # 1. Load data into Pandas (Preserves Vectors)
+    df = table.to_pandas()
+
+    # 2. Add / refresh derived columns
+    df = video_index.add_derived_columns(df)
+    print("✨ Columns:", list(df.columns))
+
+    # 3. Overwrite Table
+    # Pin the original column types; pandas would otherwise widen strings to large_string,
+    # which the BTREE index does not accept.
+    print("💾 Overwriting table with derived columns...")
+    schema = video_index.derived_schema(table.schema)
+    data = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    table = db.create_table(TABLE_NAME, data=data, mode="overwrite")
+
+    # 4. Rebuild indexes (overwriting drops them)
+    if len(table) > VECTOR_INDEX_MIN_ROWS:
+        print("⚙️ Rebuilding vector index (IVF-PQ)...")
+        table.create_index(metric="cosine", vector_column_name="vector")
+
+    print("⚙️ Building scalar indexes...")
+    video_index.create_scalar_indexes(table)
+
+    print("⚙️ Building full-text index (character n-grams)...")
+    video_index.create_fts_index(table)
+
+    print("\n✅ Upgrade Complete!")
+    print(f"Restart 'main.py' to use the new indexes. If issues persist, restore from '{BACKUP_FOLDER}'.")
+
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -0,0 +1,119 @@
+# Derived columns, scalar and full-text indexes on the LanceDB `videos` table.
+# Used by main.py to build filters and by upgrade_index.py to add them to an
+# existing table. STJAV.ipynb produces the same columns at index time.
+
+import re
+
+import pyarrow as pa
+from lancedb.index import FTS, BTree, LabelList
+
+# --- CONFIGURATION ---
+ACTRESS_LIST_COLUMN = "actress_list"
+DVDID_KEY_COLUMN = "dvdid_key"
+FTS_TEXT_COLUMN = "fts_text"
+# Character n-grams: Japanese titles have no spaces to split on, and 2-grams are
+# the usual unit for CJK text; 3-grams keep Latin-script matches selective.
+FTS_NGRAM_MIN = 2
+FTS_NGRAM_MAX = 3
+
+
+def split_actress_names(raw):
+    """'Yua Mikami, Rin' -> ['Yua Mikami', 'Rin']"""
+    if not isinstance(raw, str) or raw.lower() == "nan":
+        return []
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def dvdid_key(raw):
+    """'SSNI-123', 'ssni 123' and 'ssni123' all -> 'ssni123'"""
+    if not isinstance(raw, str):
+        return ""
+    return re.sub(r"[\s\-_]+", "", raw.lower())
+
+
+def fts_text(title, jptitle, dvdid):
+    """What the full-text index sees: title, Japanese title and ID in one field."""
+    parts = [str(part).strip() for part in (title, jptitle, dvdid) if isinstance(part, str)]
+    return " ".join(part for part in parts if part and part.lower() != "nan")
+
+
+def sql_quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def actress_filter(name, has_actress_list):
+    """
+    WHERE clause selecting videos featuring exactly `name`.
+    Tables without the list column fall back to the old substring scan.
+    """
+    if has_actress_list:
+        return f"array_has_any({ACTRESS_LIST_COLUMN}, [{sql_quote(name)}])"
+    safe_name = name.replace("'", "''")
+    return f"actress_names LIKE '%{safe_name}%'"
+
+
+def dvdid_key_filter(key):
+    """Exact match on the normalized key."""
+    return f"{DVDID_KEY_COLUMN} = {sql_quote(key)}"
+
+
+def dvdid_in_filter(ids, column="dvdid"):
+    return f"{column} IN (" + ", ".join(sql_quote(i) for i in ids) + ")"
+
+
+def dvdid_prefix_filter(key):
+    """
+    Every key starting with `key`, as a range the BTREE index can answer:
+    'ssni1' -> ssni1 <= k < ssni2
+    """
+    upper = key[:-1] + chr(ord(key[-1]) + 1)
+    return f"{DVDID_KEY_COLUMN} >= {sql_quote(key)} AND {DVDID_KEY_COLUMN} < {sql_quote(upper)}"
+
+
+def derived_schema(base_schema):
+    """`base_schema` with the derived columns (re)appended at their proper types."""
+    derived = [
+        pa.field(ACTRESS_LIST_COLUMN, pa.list_(pa.string())),
+        pa.field(DVDID_KEY_COLUMN, pa.string()),
+        pa.field(FTS_TEXT_COLUMN, pa.string()),
+    ]
+    names = {field.name for field in derived}
+    return pa.schema([field for field in base_schema if field.name not in names] + derived)
+
+
+def add_derived_columns(df):
+    df[ACTRESS_LIST_COLUMN] = df["actress_names"].apply(split_actress_names)
+    df[DVDID_KEY_COLUMN] = df["dvdid"].apply(dvdid_key)
+    df[FTS_TEXT_COLUMN] = [
+        fts_text(title, jptitle, dvdid) for title, jptitle, dvdid in zip(df["title"], df["jptitle"], df["dvdid"])
+    ]
+    return df
+
+
+def create_scalar_indexes(table):
+    # Label-list index: array_has_any() becomes an index lookup instead of a scan
+    table.create_index(ACTRESS_LIST_COLUMN, config=LabelList(), replace=True)
+    # B-trees: exact and prefix-range ID lookups
+    table.create_index(DVDID_KEY_COLUMN, config=BTree(), replace=True)
+    table.create_index("dvdid", config=BTree(), replace=True)
+
+
+def create_fts_index(table):
+    # BM25 over character n-grams; no stemming or stop words, which would only
+    # make sense for whitespace-separated English words
+    config = FTS(
+        base_tokenizer="ngram",
+        ngram_min_length=FTS_NGRAM_MIN,
+        ngram_max_length=FTS_NGRAM_MAX,
+        stem=False,
+        remove_stop_words=False,
+    )
+    table.create_index(FTS_TEXT_COLUMN, config=config, replace=True)
+
+
+def has_vector_index(table):
+    return any("vector" in index.columns for index in table.list_indices())
+
+
+def has_fts_index(table):
+    return any(FTS_TEXT_COLUMN in index.columns for index in table.list_indices())